@@ -1,11 +1,17 @@
-import json
 import os
+import re
 import hashlib
+import logging
+import threading
 import time
-from fastapi import APIRouter, Body, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-from app.db import SessionLocal
+from functools import lru_cache
+from fastapi import APIRouter, BackgroundTasks, Body, Depends, HTTPException, Request, Response
+from sqlalchemy import Integer, and_, bindparam, case, cast, func, lambda_stmt, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, load_only, selectinload
+from app.db import SessionLocal, get_db
 from app.models.device import Device
+from app.models.device_cached_media import DeviceCachedMedia
 from app.models.device_sync import DeviceSyncItem, DeviceSyncState
 from app.models.flash_sale import FlashSaleConfig
 from app.models.screen import Screen
@@ -13,6 +19,8 @@ from app.models.schedule import Schedule
 from app.models.playlist import Playlist, PlaylistItem
 from app.models.media import Media
 from app.schemas.device import DeviceRegisterIn
+from app.services.cache import TTLCache
+from app.services.serialization import FastJSONResponse, json_loads
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 try:
@@ -21,7 +29,9 @@ try:
 except Exception:  # pragma: no cover - optional dependency fallback
     Image = None
 
-router = APIRouter(prefix="/devices", tags=["devices"])
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/devices", tags=["devices"], default_response_class=FastJSONResponse)
+_OK_BODY = b'{"ok":true}'
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 DEVICE_OFFLINE_AFTER_SEC = int(os.getenv("SIGNAGE_DEVICE_OFFLINE_AFTER_SEC", "70"))
 DEFAULT_TRANSITION_DURATION_SEC = 1
@@ -42,6 +52,50 @@ AUTO_COMPRESS_MIN_SOURCE_BYTES = int(
 DOWNLOAD_PRIMARY_BASE_URL = (os.getenv("SIGNAGE_DOWNLOAD_BASE_URL", "") or "").strip().rstrip("/")
 DOWNLOAD_MIRROR_BASE_URL = (os.getenv("SIGNAGE_DOWNLOAD_MIRROR_URL", "") or "").strip().rstrip("/")
 FLASH_SALE_TIMEZONE = (os.getenv("SIGNAGE_FLASH_SALE_TIMEZONE", "Asia/Jakarta") or "").strip()
+SYNC_STATUS_CACHE_TTL_SEC = float(os.getenv("SIGNAGE_SYNC_STATUS_CACHE_TTL_SEC", "5"))
+MEDIA_CACHE_STATUS_CACHE_TTL_SEC = float(os.getenv("SIGNAGE_MEDIA_CACHE_STATUS_CACHE_TTL_SEC", "3"))
+STATUS_CACHE_MAX_ENTRIES = int(os.getenv("SIGNAGE_STATUS_CACHE_MAX_ENTRIES", "2048"))
+# Keyed on the sync state row version, so any progress/ack/plan write yields a new key.
+_sync_status_cache = TTLCache(SYNC_STATUS_CACHE_TTL_SEC, STATUS_CACHE_MAX_ENTRIES)
+# Keyed on the last cache report; the short TTL bounds staleness after playlist/schedule edits.
+_media_cache_status_cache = TTLCache(MEDIA_CACHE_STATUS_CACHE_TTL_SEC, STATUS_CACHE_MAX_ENTRIES)
+# Keyed on (config id, updated_at, wall-clock second): every poll within the same second shares one evaluation.
+_flash_sale_runtime_cache = TTLCache(2, STATUS_CACHE_MAX_ENTRIES)
+DEVICE_STATUS_SNAPSHOT_TTL_SEC = float(os.getenv("SIGNAGE_DEVICE_STATUS_SNAPSHOT_TTL_SEC", "10"))
+DEVICE_ID_ALLOCATE_ATTEMPTS = 5
+HEARTBEAT_FLUSH_INTERVAL_SEC = float(os.getenv("SIGNAGE_HEARTBEAT_FLUSH_SEC", "1"))
+# A heartbeat from an online device at the same IP is only recorded once last_seen is this old.
+# Keep it at most half the offline window so the next heartbeat always lands before the cutoff.
+HEARTBEAT_MIN_WRITE_INTERVAL_SEC = float(
+    os.getenv("SIGNAGE_HEARTBEAT_MIN_WRITE_SEC", str(DEVICE_OFFLINE_AFTER_SEC / 2))
+)
+# device_id -> (last_seen, client_ip); written to the DB by flush_heartbeat_buffer().
+_heartbeat_buffer: dict[str, tuple[datetime, str | None]] = {}
+_heartbeat_buffer_lock = threading.Lock()
+# Entries taken by a running flush, still visible to readers until its commit lands.
+_heartbeat_inflight: dict[str, tuple[datetime, str | None]] = {}
+_UNSET = object()
+_DEVICE_ID_RE = re.compile(r"Device-\d+")
+# Stays under SQLite's historical 999 bound-parameter limit for IN lists.
+IN_CLAUSE_CHUNK_SIZE = 900
+_MEDIA_BY_IDS_STMT = select(Media).where(Media.id.in_(bindparam("media_ids", expanding=True)))
+_HMS_RE = re.compile(r"([01]\d|2[0-3]):([0-5]\d)(?::([0-5]\d))?")
+_DEVICE_LIST_COLUMNS = (
+    Device.id,
+    Device.legacy_id,
+    Device.client_ip,
+    Device.name,
+    Device.location,
+    Device.owner_account,
+    Device.last_seen,
+    Device.status,
+    Device.orientation,
+    Device.media_quality_tier,
+)
+# list_devices serves these per-device status fields and refreshes stale ones after responding.
+_device_status_snapshots: dict[str, tuple[float, dict]] = {}
+_device_status_refreshing: set[str] = set()
+_device_status_snapshot_lock = threading.Lock()
 try:
     _FLASH_SALE_TZ = ZoneInfo(FLASH_SALE_TIMEZONE) if FLASH_SALE_TIMEZONE else None
 except Exception:
@@ -67,38 +121,29 @@ def _flash_sale_localize_activated_at(value: datetime | None) -> datetime | None
     except Exception:
         return value
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 
 def _resolve_account_id(request: Request, explicit: str | None = None) -> str | None:
-    candidate = (explicit or "").strip()
-    if candidate:
+    if explicit and (candidate := explicit.strip()):
         return candidate
-    header_account = (request.headers.get("X-Account-ID") or "").strip()
-    if header_account:
+    headers = request.headers
+    if (header_account := headers.get("X-Account-ID")) and (header_account := header_account.strip()):
         return header_account
-    header_api = (request.headers.get("X-API-Key") or "").strip()
-    if header_api:
+    if (header_api := headers.get("X-API-Key")) and (header_api := header_api.strip()):
         return header_api
     return None
 
 
 def _resolve_client_ip(request: Request) -> str | None:
-    forwarded = (request.headers.get("X-Forwarded-For") or "").strip()
-    if forwarded:
-        first = forwarded.split(",")[0].strip()
-        if first:
+    headers = request.headers
+    if forwarded := headers.get("X-Forwarded-For"):
+        # Only the left-most hop matters; don't split the whole chain.
+        if first := forwarded.split(",", 1)[0].strip():
             return first
-    real_ip = (request.headers.get("X-Real-IP") or "").strip()
-    if real_ip:
+    if (real_ip := headers.get("X-Real-IP")) and (real_ip := real_ip.strip()):
         return real_ip
-    if request.client and request.client.host:
-        return request.client.host
+    client = request.client
+    if client and client.host:
+        return client.host
     return None
 
 
@@ -111,14 +156,14 @@ def _request_origin(request: Request) -> str:
     return str(request.base_url).rstrip("/")
 
 
-def _download_base_urls(request: Request) -> list[str]:
+def _download_base_urls(request: Request) -> tuple[str, ...]:
     output: list[str] = []
     primary = DOWNLOAD_PRIMARY_BASE_URL or _request_origin(request)
     if primary:
         output.append(primary)
     if DOWNLOAD_MIRROR_BASE_URL and DOWNLOAD_MIRROR_BASE_URL not in output:
         output.append(DOWNLOAD_MIRROR_BASE_URL)
-    return output
+    return tuple(output)
 
 
 def _local_path_from_public_path(path: str) -> str:
@@ -205,7 +250,7 @@ def _auto_optimize_media_on_repeated_failure(
     if Image is None:
         return {"optimized": False, "reason": "pillow_not_available"}
 
-    media_row = db.query(Media).get(media_id)
+    media_row = db.get(Media, media_id)
     if media_row is None:
         return {"optimized": False, "reason": "media_not_found"}
     if str(media_row.type or "").strip().lower() != "image":
@@ -317,24 +362,73 @@ def _enforce_device_owner(device: Device, account_id: str | None) -> None:
 
 
 def _find_device(db: Session, device_id: str) -> Device | None:
-    direct = db.query(Device).get(device_id)
-    if direct:
-        return direct
-    return db.query(Device).filter(Device.legacy_id == device_id).first()
+    if _DEVICE_ID_RE.fullmatch(device_id):
+        # Current-style ids almost always hit the primary key (or the identity map).
+        direct = db.get(Device, device_id)
+        if direct:
+            return direct
+    # One roundtrip for legacy ids; an exact id match still wins over a legacy_id match.
+    stmt = lambda_stmt(
+        lambda: select(Device)
+        .where(or_(Device.id == device_id, Device.legacy_id == device_id))
+        .order_by(case((Device.id == device_id, 0), else_=1))
+        .limit(1)
+    )
+    return db.execute(stmt).scalars().first()
+
+
+def _load_device_for_request(
+    db: Session,
+    device_id: str,
+    request: Request,
+    account_id: str | None = None,
+) -> Device:
+    device = _find_device(db, device_id)
+    if not device:
+        raise HTTPException(status_code=404, detail="Device not found")
+    _enforce_device_owner(device, _resolve_account_id(request, account_id))
+    return device
 
 
 def _assign_unique_client_ip(db: Session, device: Device, client_ip: str | None) -> None:
     if not client_ip:
         return
+    if device.client_ip == client_ip:
+        # client_ip is unique, so a device already holding it has no duplicates to clear.
+        return
     duplicates = db.query(Device).filter(Device.client_ip == client_ip, Device.id != device.id).all()
     for duplicate in duplicates:
         duplicate.client_ip = None
     device.client_ip = client_ip
 
 
+def buffered_heartbeats() -> dict[str, datetime]:
+    """last_seen of heartbeats accepted but not yet written by flush_heartbeat_buffer()."""
+    with _heartbeat_buffer_lock:
+        output = {device_id: entry[0] for device_id, entry in _heartbeat_inflight.items()}
+        output.update((device_id, entry[0]) for device_id, entry in _heartbeat_buffer.items())
+    return output
+
+
+def _pending_heartbeat(device_id: str) -> dict[str, datetime]:
+    """`buffered_heartbeats()` narrowed to one device, without copying the whole buffer."""
+    with _heartbeat_buffer_lock:
+        entry = _heartbeat_buffer.get(device_id) or _heartbeat_inflight.get(device_id)
+    return {device_id: entry[0]} if entry else {}
+
+
+def effective_last_seen(device_id: str, last_seen: datetime | None, buffered: dict[str, datetime]) -> datetime | None:
+    pending = buffered.get(device_id)
+    if pending is not None and (last_seen is None or pending > last_seen):
+        return pending
+    return last_seen
+
+
 def _sync_runtime_status(device: Device, now: datetime | None = None) -> bool:
     current_time = now or datetime.utcnow()
-    is_online = device.last_seen is not None and (current_time - device.last_seen).total_seconds() <= DEVICE_OFFLINE_AFTER_SEC
+    device_id = str(device.id)
+    last_seen = effective_last_seen(device_id, device.last_seen, _pending_heartbeat(device_id))
+    is_online = last_seen is not None and (current_time - last_seen).total_seconds() <= DEVICE_OFFLINE_AFTER_SEC
     next_status = "online" if is_online else "offline"
     if device.status != next_status:
         device.status = next_status
@@ -342,8 +436,45 @@ def _sync_runtime_status(device: Device, now: datetime | None = None) -> bool:
     return False
 
 
+def _sync_runtime_status_bulk(
+    db: Session,
+    now: datetime | None = None,
+    buffered: dict[str, datetime] | None = None,
+) -> bool:
+    """Set-based `_sync_runtime_status` for every device; returns True when any row changed."""
+    cutoff = (now or datetime.utcnow()) - timedelta(seconds=DEVICE_OFFLINE_AFTER_SEC)
+    if buffered is None:
+        buffered = buffered_heartbeats()
+    # Devices with an unflushed heartbeat count as seen at that time.
+    fresh_ids = [device_id for device_id, last_seen in buffered.items() if last_seen >= cutoff]
+    offline_filter = [
+        or_(Device.last_seen.is_(None), Device.last_seen < cutoff),
+        or_(Device.status.is_(None), Device.status != "offline"),
+    ]
+    online_seen = Device.last_seen >= cutoff
+    if fresh_ids:
+        offline_filter.append(Device.id.notin_(fresh_ids))
+        online_seen = or_(online_seen, Device.id.in_(fresh_ids))
+    online_filter = [online_seen, or_(Device.status.is_(None), Device.status != "online")]
+    # Read-only drift probe first: on SQLite an UPDATE takes the write lock even when it
+    # matches nothing, and the common poll has no drift at all.
+    drifted = db.query(
+        db.query(Device.id).filter(or_(and_(*offline_filter), and_(*online_filter))).exists()
+    ).scalar()
+    if not drifted:
+        return False
+    went_offline = db.query(Device).filter(*offline_filter).update({Device.status: "offline"}, synchronize_session=False)
+    went_online = db.query(Device).filter(*online_filter).update({Device.status: "online"}, synchronize_session=False)
+    return bool(went_offline or went_online)
+
+
+@lru_cache(maxsize=256)
 def _parse_hms(value: str) -> tuple[int, int, int] | None:
     raw = (value or "").strip()
+    # Stored times are normalized to HH:MM:SS; the split path below keeps lenient input working.
+    match = _HMS_RE.fullmatch(raw)
+    if match:
+        return int(match[1]), int(match[2]), int(match[3] or 0)
     parts = raw.split(":")
     if len(parts) not in (2, 3):
         return None
@@ -369,15 +500,6 @@ def _normalize_media_id_set(values: list[str] | None) -> list[str]:
     return sorted(normalized)
 
 
-def _parse_cached_media_ids(csv: str | None) -> set[str]:
-    output: set[str] = set()
-    for item in (csv or "").split(","):
-        value = item.strip()
-        if value:
-            output.add(value)
-    return output
-
-
 def _normalize_media_quality_tier(value: str | None) -> str:
     normalized = str(value or "").strip().lower()
     if normalized in {"low", "normal", "high"}:
@@ -385,14 +507,17 @@ def _normalize_media_quality_tier(value: str | None) -> str:
     return "normal"
 
 
+_DOWNLOAD_STATUS_PRESENTATION: dict[str, tuple[str, str]] = {
+    "completed": ("Selesai", "#16A34A"),
+    "in_progress": ("Sedang Download", "#F59E0B"),
+    "not_reported": ("Belum Lapor", "#6B7280"),
+    "no_content": ("Tidak Ada Konten", "#2563EB"),
+}
+_UNKNOWN_DOWNLOAD_STATUS_PRESENTATION = ("Unknown", "#6B7280")
+
+
 def _download_status_presentation(download_status: str) -> tuple[str, str]:
-    mapping = {
-        "completed": ("Selesai", "#16A34A"),
-        "in_progress": ("Sedang Download", "#F59E0B"),
-        "not_reported": ("Belum Lapor", "#6B7280"),
-        "no_content": ("Tidak Ada Konten", "#2563EB"),
-    }
-    return mapping.get(download_status, ("Unknown", "#6B7280"))
+    return _DOWNLOAD_STATUS_PRESENTATION.get(download_status, _UNKNOWN_DOWNLOAD_STATUS_PRESENTATION)
 
 
 def _download_overview(sync_status: dict, media_cache_status: dict) -> dict:
@@ -439,60 +564,64 @@ def _download_overview(sync_status: dict, media_cache_status: dict) -> dict:
     }
 
 
-def _compute_media_cache_status(db: Session, device: Device) -> dict:
-    required_ids = _collect_required_media_ids(db, device)
+def _compute_media_cache_status(
+    db: Session,
+    device: Device,
+    required_ids: set[str] | None = None,
+    *,
+    detail: bool = True,
+) -> dict:
+    """Cache readiness for a device; `detail=False` skips the sorted id lists and returns counts only."""
+    if required_ids is None:
+        required_ids = _collect_required_media_ids(db, device)
     quality_tier = _normalize_media_quality_tier(getattr(device, "media_quality_tier", "normal"))
-    normal_ids = _parse_cached_media_ids(device.cached_media_ids)
-    low_ids = _parse_cached_media_ids(getattr(device, "cached_media_low_ids", None))
-    if not low_ids:
-        low_ids = set(normal_ids)
+    normal_ids = device.cached_media_id_set
+    low_ids = device.cached_media_low_id_set or normal_ids
     if quality_tier == "low":
-        cached_ids = set(low_ids)
+        cached_ids = low_ids
     else:
         # normal/high readiness tetap minimal tier normal agar tidak menunggu high tanpa batas.
-        cached_ids = set(normal_ids)
-    missing_ids = sorted(required_ids - cached_ids)
-    extra_ids = sorted(cached_ids - required_ids)
+        cached_ids = normal_ids
+    missing = required_ids - cached_ids
+    missing_count = len(missing)
     has_report = device.media_cache_updated_at is not None
 
     if len(required_ids) == 0:
         download_status = "no_content"
     elif not has_report:
         download_status = "not_reported"
-    elif len(missing_ids) == 0:
+    elif missing_count == 0:
         download_status = "completed"
     else:
         download_status = "in_progress"
     status_label, status_color = _download_status_presentation(download_status)
 
-    return {
+    output = {
         "required_count": len(required_ids),
         "cached_count": len(cached_ids),
-        "missing_count": len(missing_ids),
-        "ready": len(missing_ids) == 0,
+        "missing_count": missing_count,
+        "ready": missing_count == 0,
         "download_status": download_status,
         "download_status_label": status_label,
         "download_status_color": status_color,
-        "required_media_ids": sorted(required_ids),
-        "missing_media_ids": missing_ids,
-        "extra_cached_media_ids": extra_ids,
         "cache_updated_at": device.media_cache_updated_at.isoformat() if device.media_cache_updated_at else None,
         "target_quality_tier": quality_tier,
     }
+    if detail:
+        output["required_media_ids"] = sorted(required_ids)
+        output["missing_media_ids"] = sorted(missing)
+        output["extra_cached_media_ids"] = sorted(cached_ids - required_ids)
+    return output
 
 
-def _compute_media_tier_status(db: Session, device: Device) -> dict:
-    required_ids = _collect_required_media_ids(db, device)
+def _compute_media_tier_status(db: Session, device: Device, required_ids: set[str] | None = None) -> dict:
+    if required_ids is None:
+        required_ids = _collect_required_media_ids(db, device)
     required_count = len(required_ids)
-    normal_ids = _parse_cached_media_ids(device.cached_media_ids)
-    low_ids = _parse_cached_media_ids(getattr(device, "cached_media_low_ids", None))
-    high_ids = _parse_cached_media_ids(getattr(device, "cached_media_high_ids", None))
-
-    # Backward compatibility: if low/high not reported yet, infer from normal cache.
-    if not low_ids:
-        low_ids = set(normal_ids)
-    if not high_ids:
-        high_ids = set()
+    normal_ids = device.cached_media_id_set
+    # Backward compatibility: if low not reported yet, infer from normal cache.
+    low_ids = device.cached_media_low_id_set or normal_ids
+    high_ids = device.cached_media_high_id_set
 
     low_ready_ids = required_ids.intersection(low_ids)
     normal_ready_ids = required_ids.intersection(normal_ids)
@@ -541,74 +670,167 @@ def _compute_media_tier_status(db: Session, device: Device) -> dict:
     }
 
 
-def _collect_required_media_ids(db: Session, device: Device) -> set[str]:
-    screens = db.query(Screen).filter(Screen.device_id == device.id).all()
-    schedules = []
-    playlists = []
-    playlist_items = []
-    media_ids: set[str] = set()
+def _media_cache_status_snapshot(
+    db: Session,
+    device: Device,
+    required_ids: set[str] | None = None,
+    *,
+    detail: bool = True,
+) -> tuple[dict, dict]:
+    if required_ids is None:
+        required_ids = _collect_required_media_ids(db, device)
+    # Keyed on the required set too, so playlist/schedule/flash-sale edits miss the cache.
+    cache_key = (
+        str(device.id),
+        device.media_cache_updated_at,
+        _normalize_media_quality_tier(getattr(device, "media_quality_tier", "normal")),
+        frozenset(required_ids),
+        detail,
+    )
+    cached = _media_cache_status_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    snapshot = (
+        _compute_media_cache_status(db, device, required_ids, detail=detail),
+        _compute_media_tier_status(db, device, required_ids),
+    )
+    _media_cache_status_cache.set(cache_key, snapshot)
+    return snapshot
 
-    for screen in screens:
-        screen_schedules = db.query(Schedule).filter(Schedule.screen_id == screen.id).all()
-        schedules.extend(screen_schedules)
 
-        screen_playlists = db.query(Playlist).filter(Playlist.screen_id == screen.id).all()
-        playlists.extend(screen_playlists)
+def _collect_required_media_ids(
+    db: Session,
+    device: Device,
+    *,
+    flash_sale_config: FlashSaleConfig | None | object = _UNSET,
+    now: datetime | None = None,
+) -> set[str]:
+    screen_rows = db.query(Screen.id, Screen.active_playlist_id).filter(Screen.device_id == device.id).all()
+    screen_ids = [screen_id for screen_id, _active_id in screen_rows]
+    media_ids: set[str] = set()
 
-        for pl in screen_playlists:
-            items = db.query(PlaylistItem).filter(PlaylistItem.playlist_id == pl.id).all()
-            playlist_items.extend(items)
-            for it in items:
-                media_ids.add(str(it.media_id))
+    if screen_ids:
+        # Central/shared playlists may be referenced by active_playlist_id or schedule.playlist_id
+        # even when they belong to another screen/device.
+        referenced_playlist_ids: set[str] = set()
+        for _screen_id, active_playlist_id in screen_rows:
+            active_id = str(active_playlist_id or "").strip()
+            if active_id:
+                referenced_playlist_ids.add(active_id)
+        schedule_rows = (
+            db.query(Schedule.playlist_id)
+            .filter(Schedule.screen_id.in_(screen_ids))
+            .distinct()
+            .all()
+        )
+        for (playlist_id,) in schedule_rows:
+            pid = str(playlist_id or "").strip()
+            if pid:
+                referenced_playlist_ids.add(pid)
+
+        playlist_filter = Playlist.screen_id.in_(screen_ids)
+        if referenced_playlist_ids:
+            playlist_filter = or_(playlist_filter, Playlist.id.in_(referenced_playlist_ids))
+        item_rows = (
+            db.query(PlaylistItem.media_id)
+            .join(Playlist, PlaylistItem.playlist_id == Playlist.id)
+            .filter(playlist_filter)
+            .distinct()
+            .all()
+        )
+        media_ids.update(media_id for (media_id,) in item_rows if media_id)
 
-    known_playlist_ids = {str(pl.id) for pl in playlists}
-    referenced_playlist_ids: set[str] = set()
-    for screen in screens:
-        active_id = str(screen.active_playlist_id or "").strip()
-        if active_id:
-            referenced_playlist_ids.add(active_id)
-    for sc in schedules:
-        pid = str(sc.playlist_id or "").strip()
-        if pid:
-            referenced_playlist_ids.add(pid)
+    if flash_sale_config is _UNSET:
+        # Callers that already loaded the config (sync plan) pass it in to skip the re-read.
+        flash_sale_config = db.query(FlashSaleConfig).filter(FlashSaleConfig.device_id == device.id).first()
+    media_ids.update(_flash_sale_required_media_ids(flash_sale_config, now or _flash_sale_now()))
+    return media_ids
 
-    missing_referenced_ids = [
-        pid for pid in referenced_playlist_ids if pid not in known_playlist_ids
-    ]
-    if missing_referenced_ids:
-        referenced_playlists = db.query(Playlist).filter(Playlist.id.in_(missing_referenced_ids)).all()
-        for pl in referenced_playlists:
-            items = db.query(PlaylistItem).filter(PlaylistItem.playlist_id == pl.id).all()
-            playlist_items.extend(items)
-            for it in items:
-                media_ids.add(str(it.media_id))
 
-    flash_sale_config = db.query(FlashSaleConfig).filter(FlashSaleConfig.device_id == device.id).first()
-    flash_sale_runtime = _resolve_flash_sale_runtime(flash_sale_config, _flash_sale_now())
+def _flash_sale_required_media_ids(config: FlashSaleConfig | None, now: datetime) -> set[str]:
+    flash_sale_runtime = _resolve_flash_sale_runtime(config, now)
     if (
         flash_sale_runtime
         and flash_sale_runtime.get("enabled")
         and not flash_sale_runtime.get("is_draft")
         and flash_sale_runtime.get("products_json")
     ):
-        try:
-            rows = json.loads(flash_sale_runtime["products_json"])
-            if isinstance(rows, list):
-                for row in rows:
-                    if not isinstance(row, dict):
-                        continue
-                    media_id = str(row.get("media_id", "")).strip()
-                    if media_id:
-                        media_ids.add(media_id)
-        except Exception:
-            pass
+        return _flash_sale_media_ids_from_runtime(flash_sale_runtime)
+    return set()
 
-    return media_ids
+
+def _collect_required_media_ids_bulk(db: Session, device_ids: list[str]) -> dict[str, set[str]]:
+    """Same result as `_collect_required_media_ids` for many devices with a fixed number of queries."""
+    output: dict[str, set[str]] = {device_id: set() for device_id in device_ids}
+    if not device_ids:
+        return output
+
+    screen_rows = (
+        db.query(Screen.id, Screen.device_id, Screen.active_playlist_id)
+        .filter(Screen.device_id.in_(device_ids))
+        .all()
+    )
+    device_by_screen = {screen_id: device_id for screen_id, device_id, _active_id in screen_rows}
+    referenced_by_device: dict[str, set[str]] = {device_id: set() for device_id in device_ids}
+    for _screen_id, device_id, active_playlist_id in screen_rows:
+        active_id = str(active_playlist_id or "").strip()
+        if active_id:
+            referenced_by_device[device_id].add(active_id)
+
+    if device_by_screen:
+        screen_ids = list(device_by_screen)
+        schedule_rows = (
+            db.query(Schedule.screen_id, Schedule.playlist_id)
+            .filter(Schedule.screen_id.in_(screen_ids))
+            .distinct()
+            .all()
+        )
+        for screen_id, playlist_id in schedule_rows:
+            pid = str(playlist_id or "").strip()
+            if pid:
+                referenced_by_device[device_by_screen[screen_id]].add(pid)
+
+        referenced_ids = set().union(*referenced_by_device.values())
+        playlist_filter = Playlist.screen_id.in_(screen_ids)
+        if referenced_ids:
+            playlist_filter = or_(playlist_filter, Playlist.id.in_(referenced_ids))
+        item_rows = (
+            db.query(Playlist.id, Playlist.screen_id, PlaylistItem.media_id)
+            .join(PlaylistItem, PlaylistItem.playlist_id == Playlist.id)
+            .filter(playlist_filter)
+            .distinct()
+            .all()
+        )
+        media_by_playlist: dict[str, set[str]] = {}
+        for playlist_id, screen_id, media_id in item_rows:
+            if not media_id:
+                continue
+            media_by_playlist.setdefault(playlist_id, set()).add(media_id)
+            owner_device = device_by_screen.get(screen_id)
+            if owner_device is not None:
+                output[owner_device].add(media_id)
+        for device_id, playlist_ids in referenced_by_device.items():
+            for playlist_id in playlist_ids:
+                output[device_id].update(media_by_playlist.get(playlist_id, ()))
+
+    now = _flash_sale_now()
+    for config in db.query(FlashSaleConfig).filter(FlashSaleConfig.device_id.in_(device_ids)).all():
+        output[config.device_id].update(_flash_sale_required_media_ids(config, now))
+    return output
 
 
 def _resolve_flash_sale_runtime(config: FlashSaleConfig | None, now: datetime) -> dict | None:
     if not config:
         return None
+    cache_key = (config.id, config.updated_at, now.replace(microsecond=0))
+    runtime = _flash_sale_runtime_cache.get(cache_key)
+    if runtime is None:
+        runtime = _compute_flash_sale_runtime(config, now)
+        _flash_sale_runtime_cache.set(cache_key, runtime)
+    return dict(runtime)
+
+
+def _compute_flash_sale_runtime(config: FlashSaleConfig, now: datetime) -> dict:
     is_draft = bool(getattr(config, "is_draft", False))
     enabled = bool(config.enabled) and not is_draft
     countdown_sec = config.countdown_sec if (config.countdown_sec or 0) > 0 else None
@@ -702,34 +924,56 @@ def _resolve_flash_sale_runtime(config: FlashSaleConfig | None, now: datetime) -
         "schedule_end_time": config.schedule_end_time,
         "warmup_minutes": warmup_minutes,
         "warmup_active": warmup_active,
-        "warmup_start_at": warmup_start.isoformat() if warmup_start else None,
-        "runtime_start_at": runtime_start.isoformat() if runtime_start else None,
-        "runtime_end_at": runtime_end.isoformat() if runtime_end else None,
-        "countdown_end_at": countdown_end.isoformat() if countdown_end else None,
-        "activated_at": config.activated_at.isoformat() if config.activated_at else None,
-        "updated_at": config.updated_at.isoformat() if config.updated_at else None,
+        "warmup_start_at": warmup_start,
+        "runtime_start_at": runtime_start,
+        "runtime_end_at": runtime_end,
+        "countdown_end_at": countdown_end,
+        "activated_at": config.activated_at,
+        "updated_at": config.updated_at,
     }
 
 
+@lru_cache(maxsize=256)
+def _products_json_media_ids(raw: str) -> frozenset[str]:
+    # Keyed on the raw products_json, so an unchanged config is parsed once per process.
+    try:
+        rows = json_loads(raw)
+    except Exception:
+        return frozenset()
+    if not isinstance(rows, list):
+        return frozenset()
+    output: set[str] = set()
+    for row in rows:
+        if not isinstance(row, dict):
+            continue
+        media_id = str(row.get("media_id", "")).strip()
+        if media_id:
+            output.add(media_id)
+    return frozenset(output)
+
+
 def _flash_sale_media_ids_from_runtime(runtime: dict | None) -> set[str]:
     if not runtime:
         return set()
     raw = runtime.get("products_json")
     if not raw:
         return set()
-    output: set[str] = set()
-    try:
-        rows = json.loads(raw)
-        if isinstance(rows, list):
-            for row in rows:
-                if not isinstance(row, dict):
-                    continue
-                media_id = str(row.get("media_id", "")).strip()
-                if media_id:
-                    output.add(media_id)
-    except Exception:
+    return set(_products_json_media_ids(raw))
+
+
+def _cached_media_ids_among(db: Session, device_id: str, media_ids: set[str], tier: str = "normal") -> set[str]:
+    if not media_ids:
         return set()
-    return output
+    rows = (
+        db.query(DeviceCachedMedia.media_id)
+        .filter(
+            DeviceCachedMedia.device_id == device_id,
+            DeviceCachedMedia.tier == tier,
+            DeviceCachedMedia.media_id.in_(media_ids),
+        )
+        .all()
+    )
+    return {media_id for (media_id,) in rows}
 
 
 def _apply_flash_sale_preload_guard(db: Session, device: Device, runtime: dict | None) -> dict | None:
@@ -738,7 +982,7 @@ def _apply_flash_sale_preload_guard(db: Session, device: Device, runtime: dict |
 
     enriched = dict(runtime)
     required_ids = _flash_sale_media_ids_from_runtime(enriched)
-    cached_ids = _parse_cached_media_ids(device.cached_media_ids)
+    cached_ids = _cached_media_ids_among(db, str(device.id), required_ids)
     missing_ids = sorted(required_ids - cached_ids)
     sync_status = _device_sync_status_payload(db, str(device.id))
     queue_status = str(sync_status.get("queue_status", "idle"))
@@ -801,11 +1045,25 @@ def _priority_rank(priority: str) -> int:
     return ranking.get(priority, 9)
 
 
-def _playlist_media_ids(db: Session, playlist_id: str) -> set[str]:
+def _load_media_by_ids(db: Session, media_ids) -> list[Media]:
+    ids = list(media_ids)
+    rows: list[Media] = []
+    for start in range(0, len(ids), IN_CLAUSE_CHUNK_SIZE):
+        chunk = ids[start:start + IN_CLAUSE_CHUNK_SIZE]
+        rows.extend(db.execute(_MEDIA_BY_IDS_STMT, {"media_ids": chunk}).scalars().all())
+    return rows
+
+
+def _playlist_media_ids(db: Session, playlist_id: str, memo: dict[str, set[str]] | None = None) -> set[str]:
     if not playlist_id:
         return set()
+    if memo is not None and playlist_id in memo:
+        return memo[playlist_id]
     rows = db.query(PlaylistItem.media_id).filter(PlaylistItem.playlist_id == playlist_id).all()
-    return {str(media_id) for (media_id,) in rows if media_id}
+    media_ids = {media_id for (media_id,) in rows if media_id}
+    if memo is not None:
+        memo[playlist_id] = media_ids
+    return media_ids
 
 
 def _schedule_start_datetime_for_day(base_day: datetime, value) -> datetime | None:
@@ -821,27 +1079,40 @@ def _schedule_start_datetime_for_day(base_day: datetime, value) -> datetime | No
     )
 
 
+def _sync_plan_revision(plan_items: list[dict]) -> str:
+    # Content hash: identical plans keep the same revision, so re-polling does not reset progress.
+    digest = hashlib.sha1()
+    for row in plan_items:
+        digest.update(
+            "|".join(
+                (
+                    row["media_id"],
+                    row["display_path"],
+                    str(row["checksum"] or ""),
+                    str(row["size"]),
+                    row["priority"],
+                    row["required_by"],
+                    row["action"],
+                )
+            ).encode("utf-8")
+        )
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
 def _build_device_sync_plan(db: Session, device: Device) -> dict:
     now = _flash_sale_now()
     flash_media_ids: set[str] = set()
     active_playlist_media_ids: set[str] = set()
     upcoming_playlist_media_ids: set[str] = set()
+    # Shared playlists are often active on one screen and scheduled on others; read each once.
+    playlist_media_memo: dict[str, set[str]] = {}
 
     # P0: flash sale active now
     flash_sale_config = db.query(FlashSaleConfig).filter(FlashSaleConfig.device_id == device.id).first()
     flash_sale_runtime = _resolve_flash_sale_runtime(flash_sale_config, now)
-    if flash_sale_runtime and flash_sale_runtime.get("active") and flash_sale_runtime.get("products_json"):
-        try:
-            rows = json.loads(flash_sale_runtime["products_json"])
-            if isinstance(rows, list):
-                for row in rows:
-                    if not isinstance(row, dict):
-                        continue
-                    media_id = str(row.get("media_id", "")).strip()
-                    if media_id:
-                        flash_media_ids.add(media_id)
-        except Exception:
-            pass
+    if flash_sale_runtime and flash_sale_runtime.get("active"):
+        flash_media_ids.update(_flash_sale_media_ids_from_runtime(flash_sale_runtime))
 
     screens = db.query(Screen).filter(Screen.device_id == device.id).all()
     preload_until = now + timedelta(minutes=SYNC_PRELOAD_WINDOW_MIN)
@@ -850,7 +1121,7 @@ def _build_device_sync_plan(db: Session, device: Device) -> dict:
     for screen in screens:
         active_id = str(screen.active_playlist_id or "").strip()
         if active_id:
-            active_playlist_media_ids.update(_playlist_media_ids(db, active_id))
+            active_playlist_media_ids.update(_playlist_media_ids(db, active_id, playlist_media_memo))
 
     # P2: schedule starting soon (within preload window)
     for screen in screens:
@@ -866,10 +1137,12 @@ def _build_device_sync_plan(db: Session, device: Device) -> dict:
                 if start_at is None:
                     continue
                 if now <= start_at <= preload_until:
-                    upcoming_playlist_media_ids.update(_playlist_media_ids(db, str(item.playlist_id)))
+                    upcoming_playlist_media_ids.update(
+                        _playlist_media_ids(db, str(item.playlist_id), playlist_media_memo)
+                    )
 
-    all_required_ids = _collect_required_media_ids(db, device)
-    cached_ids = _parse_cached_media_ids(device.cached_media_ids)
+    all_required_ids = _collect_required_media_ids(db, device, flash_sale_config=flash_sale_config, now=now)
+    cached_ids = device.cached_media_id_set
 
     priority_by_media: dict[str, tuple[str, str]] = {}
 
@@ -891,13 +1164,7 @@ def _build_device_sync_plan(db: Session, device: Device) -> dict:
         priority_by_media.keys(),
         key=lambda media_id: (_priority_rank(priority_by_media[media_id][0]), media_id),
     )
-    media_rows = (
-        db.query(Media)
-        .filter(Media.id.in_(ordered_ids))
-        .all()
-        if ordered_ids
-        else []
-    )
+    media_rows = _load_media_by_ids(db, ordered_ids)
     media_by_id = {str(row.id): row for row in media_rows}
 
     plan_items: list[dict] = []
@@ -934,7 +1201,7 @@ def _build_device_sync_plan(db: Session, device: Device) -> dict:
 
     status = "ready" if download_count == 0 else "queued"
     return {
-        "plan_revision": now.strftime("%Y%m%d%H%M%S%f"),
+        "plan_revision": _sync_plan_revision(plan_items),
         "generated_at": now.isoformat(),
         "preload_window_min": SYNC_PRELOAD_WINDOW_MIN,
         "queue_status": status,
@@ -959,11 +1226,27 @@ def _upsert_device_sync_state(db: Session, device_id: str) -> DeviceSyncState:
     return state
 
 
-def _persist_device_sync_plan(db: Session, device_id: str, plan: dict) -> dict:
+def _sync_state_summary(state: DeviceSyncState) -> dict:
+    return {
+        "queue_status": state.queue_status,
+        "completed_count": state.completed_count,
+        "failed_count": state.failed_count,
+        "downloaded_bytes": state.downloaded_bytes,
+        "total_bytes": state.total_bytes,
+        "last_report_at": state.last_report_at.isoformat() if state.last_report_at else None,
+    }
+
+
+def _persist_device_sync_plan(db: Session, device_id: str, plan: dict, *, force: bool = False) -> dict:
     revision = str(plan.get("plan_revision", "")).strip()
     rows = plan.get("items", []) if isinstance(plan.get("items", []), list) else []
     now = datetime.utcnow()
 
+    state = _upsert_device_sync_state(db, device_id)
+    if not force and revision and state.plan_revision == revision:
+        # Same plan content: keep the device's progress instead of resetting the queue.
+        return _sync_state_summary(state)
+
     db.query(DeviceSyncItem).filter(DeviceSyncItem.device_id == device_id).delete(synchronize_session=False)
     for row in rows:
         media_id = str(row.get("media_id", "")).strip()
@@ -981,7 +1264,6 @@ def _persist_device_sync_plan(db: Session, device_id: str, plan: dict) -> dict:
             )
         )
 
-    state = _upsert_device_sync_state(db, device_id)
     summary = plan.get("summary", {}) if isinstance(plan.get("summary"), dict) else {}
     state.plan_revision = revision
     state.queue_status = str(plan.get("queue_status", "queued"))
@@ -997,24 +1279,13 @@ def _persist_device_sync_plan(db: Session, device_id: str, plan: dict) -> dict:
     state.ack_reason = None
     state.ack_at = None
     db.commit()
+    _invalidate_device_status_snapshot(device_id)
 
-    return {
-        "queue_status": state.queue_status,
-        "completed_count": state.completed_count,
-        "failed_count": state.failed_count,
-        "downloaded_bytes": state.downloaded_bytes,
-        "total_bytes": state.total_bytes,
-        "last_report_at": state.last_report_at.isoformat() if state.last_report_at else None,
-    }
+    return _sync_state_summary(state)
 
 
 def _device_sync_status_payload(db: Session, device_id: str) -> dict:
     state = db.query(DeviceSyncState).filter(DeviceSyncState.device_id == device_id).first()
-    items = (
-        db.query(DeviceSyncItem)
-        .filter(DeviceSyncItem.device_id == device_id)
-        .all()
-    )
     if state is None:
         return {
             "queue_status": "idle",
@@ -1035,6 +1306,23 @@ def _device_sync_status_payload(db: Session, device_id: str) -> dict:
             "ack_at": None,
         }
 
+    cache_key = (
+        device_id,
+        state.id,
+        state.plan_revision,
+        state.queue_status,
+        state.last_report_at,
+        state.updated_at,
+    )
+    cached = _sync_status_cache.get(cache_key)
+    if cached is not None:
+        return dict(cached)
+
+    items = (
+        db.query(DeviceSyncItem)
+        .filter(DeviceSyncItem.device_id == device_id)
+        .all()
+    )
     queued_count = 0
     downloading_count = 0
     verifying_count = 0
@@ -1067,7 +1355,7 @@ def _device_sync_status_payload(db: Session, device_id: str) -> dict:
     progress_percent = 100 if denominator == 0 else min(100, int((int(state.downloaded_bytes or 0) * 100) / denominator))
     ready = state.queue_status == "ready"
 
-    return {
+    payload = {
         "queue_status": state.queue_status,
         "plan_revision": state.plan_revision,
         "progress_percent": progress_percent,
@@ -1089,6 +1377,8 @@ def _device_sync_status_payload(db: Session, device_id: str) -> dict:
         "ack_at": state.ack_at.isoformat() if state.ack_at else None,
         "updated_at": state.updated_at.isoformat() if state.updated_at else None,
     }
+    _sync_status_cache.set(cache_key, payload)
+    return dict(payload)
 
 
 def _recover_stuck_sync_queue(
@@ -1099,15 +1389,16 @@ def _recover_stuck_sync_queue(
     force: bool = False,
 ) -> dict:
     now = datetime.utcnow()
+    device_id_str = str(device.id)
     is_online = (
         device.last_seen is not None
         and (now - device.last_seen).total_seconds() <= DEVICE_OFFLINE_AFTER_SEC
     )
-    cache_status = _compute_media_cache_status(db, device)
+    cache_status = _compute_media_cache_status(db, device, detail=False)
     missing_count = int(cache_status.get("missing_count", 0) or 0)
-    sync_status = _device_sync_status_payload(db, str(device.id))
+    sync_status = _device_sync_status_payload(db, device_id_str)
     queue_status = str(sync_status.get("queue_status", "idle") or "idle").strip().lower()
-    state = db.query(DeviceSyncState).filter(DeviceSyncState.device_id == str(device.id)).first()
+    state = db.query(DeviceSyncState).filter(DeviceSyncState.device_id == device_id_str).first()
     report_age_sec = (
         (now - state.last_report_at).total_seconds()
         if state is not None and state.last_report_at is not None
@@ -1172,7 +1463,7 @@ def _recover_stuck_sync_queue(
             "missing_count": missing_count,
         }
 
-    persisted = _persist_device_sync_plan(db, str(device.id), plan)
+    persisted = _persist_device_sync_plan(db, device_id_str, plan, force=True)
     return {
         "recovered": True,
         "recover_reason": "manual_force" if force else "stuck_timeout",
@@ -1185,69 +1476,58 @@ def _recover_stuck_sync_queue(
     }
 
 
+_SYNC_SUMMARY_FIELDS = (
+    "total_items",
+    "queued_count",
+    "downloading_count",
+    "verifying_count",
+    "completed_count",
+    "failed_count",
+    "critical_total",
+    "critical_completed",
+    "critical_failed",
+    "critical_blocking",
+    "noncritical_failed",
+)
+# normalized status -> (counter, counter for P0/P1 rows, counter for other rows)
+_SYNC_STATUS_COUNTERS = {
+    "completed": ("completed_count", "critical_completed", None),
+    "skipped": ("completed_count", "critical_completed", None),
+    "failed": ("failed_count", "critical_failed", "noncritical_failed"),
+    "downloading": ("downloading_count", "critical_blocking", None),
+    "verifying": ("verifying_count", "critical_blocking", None),
+    "queued": ("queued_count", "critical_blocking", None),
+}
+
+
 def _summarize_sync_items(db: Session, device_id: str, plan_revision: str) -> dict:
+    status_expr = func.lower(func.trim(func.coalesce(DeviceSyncItem.status, "queued")))
+    critical_expr = case(
+        (func.upper(func.trim(func.coalesce(DeviceSyncItem.priority, "P3"))).in_(("P0", "P1")), 1),
+        else_=0,
+    )
     rows = (
-        db.query(DeviceSyncItem.status, DeviceSyncItem.priority)
+        db.query(status_expr, critical_expr, func.count())
         .filter(
             DeviceSyncItem.device_id == device_id,
             DeviceSyncItem.plan_revision == plan_revision,
         )
+        .group_by(status_expr, critical_expr)
         .all()
     )
-    queued_count = 0
-    downloading_count = 0
-    verifying_count = 0
-    completed_count = 0
-    failed_count = 0
-    critical_total = 0
-    critical_completed = 0
-    critical_failed = 0
-    critical_blocking = 0
-    noncritical_failed = 0
-
-    for status, priority in rows:
-        normalized = str(status or "queued").strip().lower()
-        lane = str(priority or "P3").strip().upper()
-        is_critical = lane in {"P0", "P1"}
-        if is_critical:
-            critical_total += 1
-
-        if normalized in {"completed", "skipped"}:
-            completed_count += 1
-            if is_critical:
-                critical_completed += 1
-        elif normalized == "failed":
-            failed_count += 1
-            if is_critical:
-                critical_failed += 1
-            else:
-                noncritical_failed += 1
-        elif normalized == "downloading":
-            downloading_count += 1
-            if is_critical:
-                critical_blocking += 1
-        elif normalized == "verifying":
-            verifying_count += 1
-            if is_critical:
-                critical_blocking += 1
-        else:
-            queued_count += 1
-            if is_critical:
-                critical_blocking += 1
-
-    return {
-        "total_items": len(rows),
-        "queued_count": queued_count,
-        "downloading_count": downloading_count,
-        "verifying_count": verifying_count,
-        "completed_count": completed_count,
-        "failed_count": failed_count,
-        "critical_total": critical_total,
-        "critical_completed": critical_completed,
-        "critical_failed": critical_failed,
-        "critical_blocking": critical_blocking,
-        "noncritical_failed": noncritical_failed,
-    }
+    summary = dict.fromkeys(_SYNC_SUMMARY_FIELDS, 0)
+    for normalized, critical_flag, count in rows:
+        counter, critical_counter, noncritical_counter = _SYNC_STATUS_COUNTERS.get(
+            normalized, _SYNC_STATUS_COUNTERS["queued"]
+        )
+        summary["total_items"] += count
+        summary[counter] += count
+        if critical_flag:
+            summary["critical_total"] += count
+            summary[critical_counter] += count
+        elif noncritical_counter:
+            summary[noncritical_counter] += count
+    return summary
 
 
 @router.post("/{device_id}/media-cache-report")
@@ -1258,10 +1538,8 @@ def media_cache_report(
     account_id: str | None = None,
     db: Session = Depends(get_db),
 ):
-    device = _find_device(db, device_id)
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
-    _enforce_device_owner(device, _resolve_account_id(request, account_id))
+    device = _load_device_for_request(db, device_id, request, account_id)
+    device_id_str = str(device.id)
 
     low_ids: list[str] = []
     normal_ids: list[str] = []
@@ -1295,20 +1573,31 @@ def media_cache_report(
     device.cached_media_low_ids = ",".join(low_ids)
     device.cached_media_ids = ",".join(normal_ids)
     device.cached_media_high_ids = ",".join(high_ids)
-    device.media_cache_updated_at = datetime.utcnow()
+    db.query(DeviceCachedMedia).filter(DeviceCachedMedia.device_id == device.id).delete(synchronize_session=False)
+    db.bulk_insert_mappings(
+        DeviceCachedMedia,
+        [
+            {"device_id": device_id_str, "tier": tier, "media_id": media_id}
+            for tier, tier_ids in (("low", low_ids), ("normal", normal_ids), ("high", high_ids))
+            for media_id in tier_ids
+        ],
+    )
+    updated_at = datetime.utcnow()
+    device.media_cache_updated_at = updated_at
     db.commit()
+    _invalidate_device_status_snapshot(device_id_str)
 
     tier = _compute_media_tier_status(db, device)
 
     return {
         "ok": True,
-        "device_id": str(device.id),
+        "device_id": device_id_str,
         "cached_count": len(normal_ids),
         "cached_low_count": len(low_ids),
         "cached_high_count": len(high_ids),
         "tier_level": tier["tier_level"],
         "tier_label": tier["tier_label"],
-        "updated_at": device.media_cache_updated_at.isoformat() if device.media_cache_updated_at else None,
+        "updated_at": updated_at.isoformat(),
     }
 
 
@@ -1319,14 +1608,12 @@ def media_cache_status(
     account_id: str | None = None,
     db: Session = Depends(get_db),
 ):
-    device = _find_device(db, device_id)
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
-    _enforce_device_owner(device, _resolve_account_id(request, account_id))
+    device = _load_device_for_request(db, device_id, request, account_id)
+    cache_status, tier_status = _media_cache_status_snapshot(db, device)
     return {
         "device_id": str(device.id),
-        **_compute_media_cache_status(db, device),
-        "tier": _compute_media_tier_status(db, device),
+        **cache_status,
+        "tier": tier_status,
     }
 
 
@@ -1337,10 +1624,7 @@ def request_media_download(
     account_id: str | None = None,
     db: Session = Depends(get_db),
 ):
-    device = _find_device(db, device_id)
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
-    _enforce_device_owner(device, _resolve_account_id(request, account_id))
+    device = _load_device_for_request(db, device_id, request, account_id)
     recovery = _recover_stuck_sync_queue(
         db,
         device,
@@ -1368,15 +1652,13 @@ def device_sync_plan(
     account_id: str | None = None,
     db: Session = Depends(get_db),
 ):
-    device = _find_device(db, device_id)
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
-    _enforce_device_owner(device, _resolve_account_id(request, account_id))
+    device = _load_device_for_request(db, device_id, request, account_id)
+    device_id_str = str(device.id)
 
     plan = _build_device_sync_plan(db, device)
-    persisted = _persist_device_sync_plan(db, str(device.id), plan)
+    persisted = _persist_device_sync_plan(db, device_id_str, plan)
     return {
-        "device_id": str(device.id),
+        "device_id": device_id_str,
         **plan,
         "state": persisted,
     }
@@ -1392,13 +1674,11 @@ def device_download_channel(
     account_id: str | None = None,
     db: Session = Depends(get_db),
 ):
-    device = _find_device(db, device_id)
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
-    _enforce_device_owner(device, _resolve_account_id(request, account_id))
+    device = _load_device_for_request(db, device_id, request, account_id)
+    device_id_str = str(device.id)
 
     plan = _build_device_sync_plan(db, device)
-    persisted = _persist_device_sync_plan(db, str(device.id), plan)
+    persisted = _persist_device_sync_plan(db, device_id_str, plan)
     all_items = plan.get("items", []) if isinstance(plan.get("items"), list) else []
     download_items = [row for row in all_items if include_skipped or str(row.get("action")) == "download"]
 
@@ -1417,9 +1697,9 @@ def device_download_channel(
         high_path = str(row.get("high_path") or display_path).strip()
         if not display_path:
             continue
-        display_urls = [f"{base}{display_path}" for base in base_urls]
-        thumb_urls = [f"{base}{thumb_path}" for base in base_urls]
-        high_urls = [f"{base}{high_path}" for base in base_urls]
+        display_urls = [base + display_path for base in base_urls]
+        thumb_urls = display_urls if thumb_path == display_path else [base + thumb_path for base in base_urls]
+        high_urls = display_urls if high_path == display_path else [base + high_path for base in base_urls]
         queue_items.append(
             {
                 "media_id": str(row.get("media_id", "")).strip(),
@@ -1440,9 +1720,10 @@ def device_download_channel(
             }
         )
 
-    return {
+    # Returned as a response object so FastAPI skips the jsonable_encoder pass.
+    return FastJSONResponse({
         "ok": True,
-        "device_id": str(device.id),
+        "device_id": device_id_str,
         "plan_revision": plan.get("plan_revision"),
         "generated_at": plan.get("generated_at"),
         "queue_status": plan.get("queue_status"),
@@ -1452,6 +1733,7 @@ def device_download_channel(
         "has_more": has_more,
         "total_items": len(download_items),
         "state": persisted,
+        "base_urls": list(base_urls),
         "download_policy": {
             "max_parallel_downloads": DOWNLOAD_CHANNEL_MAX_PARALLEL,
             "retry_max_attempts": DOWNLOAD_RETRY_MAX_ATTEMPTS,
@@ -1462,7 +1744,7 @@ def device_download_channel(
             "supports_resume": True,
         },
         "items": queue_items,
-    }
+    })
 
 
 @router.post("/{device_id}/sync-progress")
@@ -1480,12 +1762,10 @@ def device_sync_progress(
     account_id: str | None = None,
     db: Session = Depends(get_db),
 ):
-    device = _find_device(db, device_id)
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
-    _enforce_device_owner(device, _resolve_account_id(request, account_id))
+    device = _load_device_for_request(db, device_id, request, account_id)
+    device_id_str = str(device.id)
 
-    state = _upsert_device_sync_state(db, str(device.id))
+    state = _upsert_device_sync_state(db, device_id_str)
     if plan_revision:
         state.plan_revision = str(plan_revision).strip()
     if queue_status:
@@ -1508,7 +1788,7 @@ def device_sync_progress(
             (
                 db.query(DeviceSyncItem)
                 .filter(
-                    DeviceSyncItem.device_id == str(device.id),
+                    DeviceSyncItem.device_id == device_id_str,
                     DeviceSyncItem.plan_revision == revision,
                     DeviceSyncItem.media_id.in_(list(completion_set)),
                 )
@@ -1530,7 +1810,7 @@ def device_sync_progress(
             existing = (
                 db.query(DeviceSyncItem.retry_count)
                 .filter(
-                    DeviceSyncItem.device_id == str(device.id),
+                    DeviceSyncItem.device_id == device_id_str,
                     DeviceSyncItem.plan_revision == revision,
                     DeviceSyncItem.media_id == media_id,
                 )
@@ -1549,7 +1829,7 @@ def device_sync_progress(
             (
                 db.query(DeviceSyncItem)
                 .filter(
-                    DeviceSyncItem.device_id == str(device.id),
+                    DeviceSyncItem.device_id == device_id_str,
                     DeviceSyncItem.plan_revision == revision,
                     DeviceSyncItem.media_id == media_id,
                 )
@@ -1576,13 +1856,13 @@ def device_sync_progress(
             # Regenerate sync plan so player receives new path/checksum for optimized media.
             db.flush()
             refreshed_plan = _build_device_sync_plan(db, device)
-            _persist_device_sync_plan(db, str(device.id), refreshed_plan)
+            _persist_device_sync_plan(db, device_id_str, refreshed_plan, force=True)
             revision = str(state.plan_revision or "").strip()
             state.last_error = (
                 f"auto_compress_requeued:{len(auto_compress_events)}"
             )
 
-        summary = _summarize_sync_items(db, str(device.id), revision)
+        summary = _summarize_sync_items(db, device_id_str, revision)
         state.completed_count = int(summary["completed_count"])
         state.failed_count = int(summary["failed_count"])
         blocking_count = (
@@ -1599,11 +1879,12 @@ def device_sync_progress(
                 state.queue_status = "failed"
 
     db.commit()
+    _invalidate_device_status_snapshot(device_id_str)
     return {
         "ok": True,
-        "device_id": str(device.id),
+        "device_id": device_id_str,
         "auto_compress_events": auto_compress_events,
-        **_device_sync_status_payload(db, str(device.id)),
+        **_device_sync_status_payload(db, device_id_str),
     }
 
 
@@ -1614,10 +1895,8 @@ def device_sync_status(
     account_id: str | None = None,
     db: Session = Depends(get_db),
 ):
-    device = _find_device(db, device_id)
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
-    _enforce_device_owner(device, _resolve_account_id(request, account_id))
+    device = _load_device_for_request(db, device_id, request, account_id)
+    device_id_str = str(device.id)
     recovery = _recover_stuck_sync_queue(
         db,
         device,
@@ -1625,9 +1904,9 @@ def device_sync_status(
         force=False,
     )
     return {
-        "device_id": str(device.id),
+        "device_id": device_id_str,
         "stuck_recovery": recovery,
-        **_device_sync_status_payload(db, str(device.id)),
+        **_device_sync_status_payload(db, device_id_str),
     }
 
 
@@ -1642,22 +1921,20 @@ def device_sync_ack(
     account_id: str | None = None,
     db: Session = Depends(get_db),
 ):
-    device = _find_device(db, device_id)
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
-    _enforce_device_owner(device, _resolve_account_id(request, account_id))
+    device = _load_device_for_request(db, device_id, request, account_id)
+    device_id_str = str(device.id)
 
-    state = _upsert_device_sync_state(db, str(device.id))
+    state = _upsert_device_sync_state(db, device_id_str)
     if plan_revision:
         state.plan_revision = str(plan_revision).strip()
     revision = str(state.plan_revision or "").strip()
     if not revision:
         raise HTTPException(status_code=400, detail="sync-ack requires plan_revision")
 
-    summary = _summarize_sync_items(db, str(device.id), revision)
+    summary = _summarize_sync_items(db, device_id_str, revision)
     state.completed_count = int(summary["completed_count"])
     state.failed_count = int(summary["failed_count"])
-    cache_status = _compute_media_cache_status(db, device)
+    cache_status = _compute_media_cache_status(db, device, detail=False)
     blocking_count = (
         int(summary["queued_count"])
         + int(summary["downloading_count"])
@@ -1690,6 +1967,7 @@ def device_sync_ack(
         state.queue_status = "failed"
         state.last_error = "sync_ack_rejected_guard_failed"
         db.commit()
+        _invalidate_device_status_snapshot(device_id_str)
         raise HTTPException(
             status_code=409,
             detail={
@@ -1718,35 +1996,136 @@ def device_sync_ack(
     state.current_media_id = None
     state.eta_sec = 0
     db.commit()
+    _invalidate_device_status_snapshot(device_id_str)
     return {
         "ok": True,
-        "device_id": str(device.id),
+        "device_id": device_id_str,
         "ack_source": state.ack_source,
         "ack_reason": state.ack_reason,
         "ack_at": state.ack_at.isoformat() if state.ack_at else None,
-        **_device_sync_status_payload(db, str(device.id)),
+        **_device_sync_status_payload(db, device_id_str),
+    }
+
+
+def _with_etag(request: Request, response: Response) -> Response:
+    """Tag a rendered response with a body hash; answer 304 when the client already has it."""
+    etag = f'"{hashlib.sha1(response.body).hexdigest()}"'
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return response
+
+
+def _device_list_row(device: Device, device_id: str, status_fields: dict) -> dict:
+    row = {
+        "id": device_id,
+        "legacy_id": device.legacy_id,
+        "client_ip": device.client_ip,
+        "name": device.name,
+        "location": device.location,
+        "last_seen": device.last_seen,
+        "status": device.status,
+        "orientation": device.orientation,
+        "media_quality_tier": _normalize_media_quality_tier(device.media_quality_tier),
+        "owner_account": device.owner_account,
     }
+    row.update(status_fields)
+    return row
+
+
+def _compute_device_status_fields(db: Session, device: Device, required_ids: set[str] | None = None) -> dict:
+    media_cache_status, media_tier_status = _media_cache_status_snapshot(db, device, required_ids, detail=False)
+    sync_status = _device_sync_status_payload(db, str(device.id))
+    download_overview = _download_overview(sync_status, media_cache_status)
+    sync_total_items = (
+        int(sync_status.get("queued_count", 0) or 0)
+        + int(sync_status.get("downloading_count", 0) or 0)
+        + int(sync_status.get("verifying_count", 0) or 0)
+        + int(sync_status.get("completed_count", 0) or 0)
+        + int(sync_status.get("failed_count", 0) or 0)
+    )
+    return {
+        "media_download_ready": media_cache_status["ready"],
+        "media_download_status": media_cache_status["download_status"],
+        "media_download_status_label": media_cache_status["download_status_label"],
+        "media_download_status_color": media_cache_status["download_status_color"],
+        "media_required_count": media_cache_status["required_count"],
+        "media_cached_count": media_cache_status["cached_count"],
+        "media_missing_count": media_cache_status["missing_count"],
+        "media_cache_updated_at": media_cache_status["cache_updated_at"],
+        "media_tier_level": media_tier_status["tier_level"],
+        "media_tier_label": media_tier_status["tier_label"],
+        "media_tier_color": media_tier_status["tier_color"],
+        "media_tier_required_count": media_tier_status["required_count"],
+        "media_tier_low_ready_count": media_tier_status["low_ready_count"],
+        "media_tier_normal_ready_count": media_tier_status["normal_ready_count"],
+        "media_tier_high_ready_count": media_tier_status["high_ready_count"],
+        "media_tier_low_ready": media_tier_status["low_ready"],
+        "media_tier_normal_ready": media_tier_status["normal_ready"],
+        "media_tier_high_ready": media_tier_status["high_ready"],
+        "sync_queue_status": sync_status.get("queue_status"),
+        "sync_progress_percent": int(sync_status.get("progress_percent", 0) or 0),
+        "sync_total_items": sync_total_items,
+        "sync_completed_count": int(sync_status.get("completed_count", 0) or 0),
+        "sync_failed_count": int(sync_status.get("failed_count", 0) or 0),
+        "download_overview_status": download_overview["status"],
+        "download_overview_label": download_overview["label"],
+        "download_overview_color": download_overview["color"],
+    }
+
+
+def _store_device_status_snapshot(device_id: str, status_fields: dict) -> None:
+    with _device_status_snapshot_lock:
+        _device_status_snapshots[device_id] = (time.monotonic(), status_fields)
+
+
+def _invalidate_device_status_snapshot(device_id: str) -> None:
+    with _device_status_snapshot_lock:
+        _device_status_snapshots.pop(device_id, None)
+
+
+def _refresh_device_status_snapshots(device_ids: list[str]) -> None:
+    db = SessionLocal()
+    try:
+        required_by_device = _collect_required_media_ids_bulk(db, device_ids)
+        for device in db.query(Device).filter(Device.id.in_(device_ids)).all():
+            device_id = str(device.id)
+            _store_device_status_snapshot(
+                device_id,
+                _compute_device_status_fields(db, device, required_by_device.get(device_id)),
+            )
+    except Exception:
+        db.rollback()
+        logger.exception("Device status snapshot refresh failed for %d device(s)", len(device_ids))
+        # Drop the stale snapshots so the next listing recomputes them inline instead of serving them again.
+        with _device_status_snapshot_lock:
+            for device_id in device_ids:
+                _device_status_snapshots.pop(device_id, None)
+    finally:
+        db.close()
+        with _device_status_snapshot_lock:
+            _device_status_refreshing.difference_update(device_ids)
+
+
+def _sequential_device_id_filter(db: Session):
+    # Only ids shaped exactly like `Device-<digits>` take part in the sequence.
+    if db.bind.dialect.name == "sqlite":
+        # SQLite has no built-in regex operator; two GLOBs express the same shape.
+        return and_(
+            Device.id.op("GLOB")("Device-[0-9]*"),
+            func.substr(Device.id, 8).op("NOT GLOB")("*[^0-9]*"),
+        )
+    return Device.id.regexp_match("^Device-[0-9]+$")
 
 
 def _next_device_id(db: Session) -> str:
-    rows = db.query(Device.id).filter(Device.id.like("Device-%")).all()
-    max_seq = 0
-    for (device_id,) in rows:
-        value = (device_id or "").strip()
-        if not value.startswith("Device-"):
-            continue
-        suffix = value.split("Device-", 1)[1]
-        if suffix.isdigit():
-            seq = int(suffix)
-            if seq > max_seq:
-                max_seq = seq
-
-    next_seq = max_seq + 1
-    candidate = f"Device-{next_seq:04d}"
-    while db.query(Device).get(candidate) is not None:
-        next_seq += 1
-        candidate = f"Device-{next_seq:04d}"
-    return candidate
+    max_seq = (
+        db.query(func.max(cast(func.substr(Device.id, 8), Integer)))
+        .filter(_sequential_device_id_filter(db))
+        .scalar()
+    )
+    return f"Device-{int(max_seq or 0) + 1:04d}"
 
 @router.post("/register")
 def register_device(
@@ -1788,9 +2167,8 @@ def register_device(
         existing.last_seen = datetime.utcnow()
         existing.status = "online"
         _assign_unique_client_ip(db, existing, client_ip)
-        db.commit()
-        db.refresh(existing)
-        return {
+        # Every field was just set here; read them before commit expires the instance.
+        response = {
             "id": str(existing.id),
             "legacy_id": existing.legacy_id,
             "client_ip": existing.client_ip,
@@ -1802,121 +2180,194 @@ def register_device(
             "media_quality_tier": _normalize_media_quality_tier(existing.media_quality_tier),
             "owner_account": existing.owner_account,
         }
-
-    device = Device(
-        id=_next_device_id(db),
-        client_ip=client_ip,
-        name=name,
-        location=location,
-        owner_account=resolved_account,
-        last_seen=datetime.utcnow(),
-        status="online",
-        orientation=orientation,
-        media_quality_tier=media_quality_tier,
-    )
-    db.add(device)
-    db.commit()
-    db.refresh(device)
-    main_screen = Screen(
-        device_id=device.id,
-        name="Main",
-        transition_duration_sec=DEFAULT_TRANSITION_DURATION_SEC,
+        db.commit()
+        return response
+
+    # A concurrent registration can take the same id between MAX() and INSERT;
+    # the primary key rejects it and the insert is retried with a fresh id.
+    registered_at = datetime.utcnow()
+    for _attempt in range(DEVICE_ID_ALLOCATE_ATTEMPTS):
+        device = Device(
+            id=_next_device_id(db),
+            client_ip=client_ip,
+            name=name,
+            location=location,
+            owner_account=resolved_account,
+            last_seen=registered_at,
+            status="online",
+            orientation=orientation,
+            media_quality_tier=media_quality_tier,
+        )
+        try:
+            with db.begin_nested():
+                db.add(device)
+        except IntegrityError:
+            continue
+        break
+    else:
+        raise HTTPException(status_code=409, detail="Gagal membuat device id unik, coba lagi.")
+    device_id_str = str(device.id)
+    db.add(
+        Screen(
+            device_id=device_id_str,
+            name="Main",
+            transition_duration_sec=DEFAULT_TRANSITION_DURATION_SEC,
+        )
     )
-    db.add(main_screen)
-    db.commit()
-    return {
-        "id": str(device.id),
-        "legacy_id": device.legacy_id,
-        "client_ip": device.client_ip,
-        "name": device.name,
-        "location": device.location,
-        "last_seen": device.last_seen,
-        "status": device.status,
-        "orientation": device.orientation,
-        "media_quality_tier": _normalize_media_quality_tier(device.media_quality_tier),
-        "owner_account": device.owner_account,
+    # Built before commit so the expired instance does not need a reload.
+    response = {
+        "id": device_id_str,
+        "legacy_id": None,
+        "client_ip": client_ip,
+        "name": name,
+        "location": location,
+        "last_seen": registered_at,
+        "status": "online",
+        "orientation": orientation,
+        "media_quality_tier": media_quality_tier,
+        "owner_account": resolved_account,
     }
+    db.commit()
+    return response
+
+def flush_heartbeat_buffer() -> int:
+    """Write buffered heartbeats in one transaction; returns the number of devices flushed."""
+    global _heartbeat_buffer, _heartbeat_inflight
+    with _heartbeat_buffer_lock:
+        if not _heartbeat_buffer:
+            return 0
+        pending, _heartbeat_buffer = _heartbeat_buffer, {}
+        _heartbeat_inflight = pending
+
+    # Latest heartbeat wins a shared client_ip, same as applying them one by one.
+    ip_owner: dict[str, str] = {}
+    for device_id, (_last_seen, client_ip) in sorted(pending.items(), key=lambda entry: entry[1][0]):
+        if client_ip:
+            ip_owner[client_ip] = device_id
+
+    device_table = Device.__table__
+    db = SessionLocal()
+    try:
+        if ip_owner:
+            db.execute(
+                update(device_table)
+                .where(
+                    device_table.c.client_ip == bindparam("b_client_ip"),
+                    device_table.c.id != bindparam("b_id"),
+                )
+                .values(client_ip=None),
+                [{"b_client_ip": client_ip, "b_id": device_id} for client_ip, device_id in ip_owner.items()],
+            )
+            db.execute(
+                update(device_table)
+                .where(device_table.c.id == bindparam("b_id"))
+                .values(client_ip=bindparam("b_client_ip")),
+                [{"b_client_ip": client_ip, "b_id": device_id} for client_ip, device_id in ip_owner.items()],
+            )
+        db.execute(
+            update(device_table)
+            .where(device_table.c.id == bindparam("b_id"))
+            .values(last_seen=bindparam("b_last_seen"), status="online"),
+            [{"b_id": device_id, "b_last_seen": last_seen} for device_id, (last_seen, _ip) in pending.items()],
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        # Keep the heartbeats for the next flush unless a newer one already arrived.
+        with _heartbeat_buffer_lock:
+            for device_id, entry in pending.items():
+                _heartbeat_buffer.setdefault(device_id, entry)
+        raise
+    finally:
+        with _heartbeat_buffer_lock:
+            _heartbeat_inflight = {}
+        db.close()
+    return len(pending)
+
+
+def _ok_response() -> Response:
+    # Heartbeat is the highest-rate endpoint; a fixed body skips the encoder pipeline.
+    return Response(content=_OK_BODY, media_type="application/json")
+
 
 @router.post("/{device_id}/heartbeat")
 def heartbeat(device_id: str, request: Request, db: Session = Depends(get_db)):
     device = _find_device(db, device_id)
     if device:
         _enforce_device_owner(device, _resolve_account_id(request))
-        device.last_seen = datetime.utcnow()
+        device_id_str = str(device.id)
+        now = datetime.utcnow()
+        client_ip = _resolve_client_ip(request)
+        if device.status == "online" and (not client_ip or client_ip == device.client_ip):
+            last_seen = effective_last_seen(device_id_str, device.last_seen, _pending_heartbeat(device_id_str))
+            if last_seen is not None and (now - last_seen).total_seconds() < HEARTBEAT_MIN_WRITE_INTERVAL_SEC:
+                return _ok_response()
+        if HEARTBEAT_FLUSH_INTERVAL_SEC > 0:
+            with _heartbeat_buffer_lock:
+                _heartbeat_buffer[device_id_str] = (now, client_ip)
+            return _ok_response()
+        device.last_seen = now
         device.status = "online"
-        _assign_unique_client_ip(db, device, _resolve_client_ip(request))
+        _assign_unique_client_ip(db, device, client_ip)
         db.commit()
-    return {"ok": True}
+    return _ok_response()
 
 @router.get("")
 @router.get("/")
-def list_devices(request: Request, account_id: str | None = None, db: Session = Depends(get_db)):
+def list_devices(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    account_id: str | None = None,
+    db: Session = Depends(get_db),
+):
     resolved_account = _resolve_account_id(request, account_id)
-    devices = db.query(Device).all()
-    status_changed = False
-    now = datetime.utcnow()
-    for device in devices:
-        if _sync_runtime_status(device, now):
-            status_changed = True
-    if status_changed:
-        db.commit()
-        for device in devices:
-            db.refresh(device)
+    buffered = buffered_heartbeats()
+    _sync_runtime_status_bulk(db, buffered=buffered)
+    # End the write transaction (if any) before the snapshot work so the lock is not held for the request.
+    db.commit()
+    device_query = db.query(Device).options(load_only(*_DEVICE_LIST_COLUMNS))
     if resolved_account:
-        devices = [d for d in devices if not d.owner_account or d.owner_account == resolved_account]
+        # Unclaimed devices (NULL or empty owner) stay visible to every account.
+        device_query = device_query.filter(
+            or_(
+                Device.owner_account.is_(None),
+                Device.owner_account == "",
+                Device.owner_account == resolved_account,
+            )
+        )
+    devices = device_query.all()
+    with _device_status_snapshot_lock:
+        snapshots = {str(d.id): _device_status_snapshots.get(str(d.id)) for d in devices}
+    missing_ids = [device_id for device_id, snapshot in snapshots.items() if snapshot is None]
+    if missing_ids:
+        # Only devices without a snapshot need the cache CSV columns; load those rows in full.
+        required_by_device = _collect_required_media_ids_bulk(db, missing_ids)
+        for full_device in db.query(Device).filter(Device.id.in_(missing_ids)).all():
+            full_device_id = str(full_device.id)
+            _store_device_status_snapshot(
+                full_device_id,
+                _compute_device_status_fields(db, full_device, required_by_device.get(full_device_id)),
+            )
+        with _device_status_snapshot_lock:
+            snapshots.update({device_id: _device_status_snapshots.get(device_id) for device_id in missing_ids})
+
     return_data = []
+    stale_ids: list[str] = []
+    snapshot_now = time.monotonic()
     for d in devices:
-        media_cache_status = _compute_media_cache_status(db, d)
-        media_tier_status = _compute_media_tier_status(db, d)
-        sync_status = _device_sync_status_payload(db, str(d.id))
-        download_overview = _download_overview(sync_status, media_cache_status)
-        sync_total_items = (
-            int(sync_status.get("queued_count", 0) or 0)
-            + int(sync_status.get("downloading_count", 0) or 0)
-            + int(sync_status.get("verifying_count", 0) or 0)
-            + int(sync_status.get("completed_count", 0) or 0)
-            + int(sync_status.get("failed_count", 0) or 0)
-        )
-        return_data.append(
-            {
-                "id": str(d.id),
-                "legacy_id": d.legacy_id,
-                "client_ip": d.client_ip,
-                "name": d.name,
-                "location": d.location,
-                "last_seen": d.last_seen,
-                "status": d.status,
-                "orientation": d.orientation,
-                "media_quality_tier": _normalize_media_quality_tier(d.media_quality_tier),
-                "owner_account": d.owner_account,
-                "media_download_ready": media_cache_status["ready"],
-                "media_download_status": media_cache_status["download_status"],
-                "media_download_status_label": media_cache_status["download_status_label"],
-                "media_download_status_color": media_cache_status["download_status_color"],
-                "media_required_count": media_cache_status["required_count"],
-                "media_cached_count": media_cache_status["cached_count"],
-                "media_missing_count": media_cache_status["missing_count"],
-                "media_cache_updated_at": media_cache_status["cache_updated_at"],
-                "media_tier_level": media_tier_status["tier_level"],
-                "media_tier_label": media_tier_status["tier_label"],
-                "media_tier_color": media_tier_status["tier_color"],
-                "media_tier_required_count": media_tier_status["required_count"],
-                "media_tier_low_ready_count": media_tier_status["low_ready_count"],
-                "media_tier_normal_ready_count": media_tier_status["normal_ready_count"],
-                "media_tier_high_ready_count": media_tier_status["high_ready_count"],
-                "media_tier_low_ready": media_tier_status["low_ready"],
-                "media_tier_normal_ready": media_tier_status["normal_ready"],
-                "media_tier_high_ready": media_tier_status["high_ready"],
-                "sync_queue_status": sync_status.get("queue_status"),
-                "sync_progress_percent": int(sync_status.get("progress_percent", 0) or 0),
-                "sync_total_items": sync_total_items,
-                "sync_completed_count": int(sync_status.get("completed_count", 0) or 0),
-                "sync_failed_count": int(sync_status.get("failed_count", 0) or 0),
-                "download_overview_status": download_overview["status"],
-                "download_overview_label": download_overview["label"],
-                "download_overview_color": download_overview["color"],
-            }
-        )
+        device_id = str(d.id)
+        computed_at, status_fields = snapshots[device_id]
+        if snapshot_now - computed_at > DEVICE_STATUS_SNAPSHOT_TTL_SEC:
+            stale_ids.append(device_id)
+        row = _device_list_row(d, device_id, status_fields)
+        row["last_seen"] = effective_last_seen(device_id, d.last_seen, buffered)
+        return_data.append(row)
+    if stale_ids:
+        with _device_status_snapshot_lock:
+            claimed = [device_id for device_id in stale_ids if device_id not in _device_status_refreshing]
+            _device_status_refreshing.update(claimed)
+        if claimed:
+            background_tasks.add_task(_refresh_device_status_snapshots, claimed)
     return return_data
 
 @router.put("/{device_id}")
@@ -1928,21 +2379,17 @@ def update_device(
     account_id: str | None = None,
     db: Session = Depends(get_db),
 ):
-    device = _find_device(db, device_id)
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
+    device = _load_device_for_request(db, device_id, request, account_id)
+    device_id_str = str(device.id)
     resolved_account = _resolve_account_id(request, account_id)
-    _enforce_device_owner(device, resolved_account)
     if not device.owner_account and resolved_account:
         device.owner_account = resolved_account
     if orientation is not None:
         device.orientation = orientation
     if media_quality_tier is not None:
         device.media_quality_tier = _normalize_media_quality_tier(media_quality_tier)
-    db.commit()
-    db.refresh(device)
-    return {
-        "id": str(device.id),
+    response = {
+        "id": device_id_str,
         "legacy_id": device.legacy_id,
         "client_ip": device.client_ip,
         "name": device.name,
@@ -1953,43 +2400,42 @@ def update_device(
         "media_quality_tier": _normalize_media_quality_tier(device.media_quality_tier),
         "owner_account": device.owner_account,
     }
+    db.commit()
+    _invalidate_device_status_snapshot(device_id_str)
+    return response
 
 @router.delete("/{device_id}")
 def delete_device(device_id: str, request: Request, account_id: str | None = None, db: Session = Depends(get_db)):
-    device = _find_device(db, device_id)
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
-    _enforce_device_owner(device, _resolve_account_id(request, account_id))
-
-    screens = db.query(Screen).filter(Screen.device_id == device.id).all()
-    screen_ids = [str(screen.id) for screen in screens]
-
-    if screen_ids:
-        playlists = db.query(Playlist).filter(Playlist.screen_id.in_(screen_ids)).all()
-        playlist_ids = [str(playlist.id) for playlist in playlists]
-
-        if playlist_ids:
-            db.query(Schedule).filter(Schedule.playlist_id.in_(playlist_ids)).delete(synchronize_session=False)
-            db.query(PlaylistItem).filter(PlaylistItem.playlist_id.in_(playlist_ids)).delete(synchronize_session=False)
-            db.query(Playlist).filter(Playlist.id.in_(playlist_ids)).delete(synchronize_session=False)
-
-        db.query(Schedule).filter(Schedule.screen_id.in_(screen_ids)).delete(synchronize_session=False)
-        db.query(Screen).filter(Screen.id.in_(screen_ids)).delete(synchronize_session=False)
+    device = _load_device_for_request(db, device_id, request, account_id)
+
+    # The FKs declare ON DELETE CASCADE, but SQLite only honours it with PRAGMA foreign_keys=ON
+    # and tables created before the declaration lack it, so children are still deleted here.
+    # Child rows are resolved through subqueries so no ids round-trip to Python.
+    # Order matters: each subquery must run before the rows it reads are deleted.
+    screen_ids = db.query(Screen.id).filter(Screen.device_id == device.id).scalar_subquery()
+    playlist_ids = db.query(Playlist.id).filter(Playlist.screen_id.in_(screen_ids)).scalar_subquery()
+    db.query(Schedule).filter(
+        or_(Schedule.playlist_id.in_(playlist_ids), Schedule.screen_id.in_(screen_ids))
+    ).delete(synchronize_session=False)
+    db.query(PlaylistItem).filter(PlaylistItem.playlist_id.in_(playlist_ids)).delete(synchronize_session=False)
+    db.query(Playlist).filter(Playlist.screen_id.in_(screen_ids)).delete(synchronize_session=False)
+    db.query(Screen).filter(Screen.device_id == device.id).delete(synchronize_session=False)
 
     db.query(FlashSaleConfig).filter(FlashSaleConfig.device_id == device.id).delete(synchronize_session=False)
     db.query(DeviceSyncItem).filter(DeviceSyncItem.device_id == device.id).delete(synchronize_session=False)
     db.query(DeviceSyncState).filter(DeviceSyncState.device_id == device.id).delete(synchronize_session=False)
+    db.query(DeviceCachedMedia).filter(DeviceCachedMedia.device_id == device.id).delete(synchronize_session=False)
+    deleted_id = str(device.id)
     db.delete(device)
     db.commit()
+    _invalidate_device_status_snapshot(deleted_id)
     return {"ok": True}
 
 @router.get("/{device_id}/config")
 def device_config(device_id: str, request: Request, account_id: str | None = None, db: Session = Depends(get_db)):
-    device = _find_device(db, device_id)
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
+    device = _load_device_for_request(db, device_id, request, account_id)
+    device_id_str = str(device.id)
     resolved_account = _resolve_account_id(request, account_id)
-    _enforce_device_owner(device, resolved_account)
     need_commit = False
     if not device.owner_account and resolved_account:
         device.owner_account = resolved_account
@@ -1999,26 +2445,24 @@ def device_config(device_id: str, request: Request, account_id: str | None = Non
         need_commit = True
     if need_commit:
         db.commit()
-        db.refresh(device)
 
-    screens = db.query(Screen).filter(Screen.device_id == device.id).all()
+    screens = (
+        db.query(Screen)
+        .options(
+            selectinload(Screen.schedules),
+            selectinload(Screen.playlists).selectinload(Playlist.items),
+        )
+        .filter(Screen.device_id == device.id)
+        .all()
+    )
 
-    schedules = []
     playlists = []
-    playlist_items = []
     media_ids = set()
 
     for screen in screens:
-        screen_schedules = db.query(Schedule).filter(Schedule.screen_id == screen.id).all()
-        schedules.extend(screen_schedules)
-
-        screen_playlists = db.query(Playlist).filter(Playlist.screen_id == screen.id).all()
-        playlists.extend(screen_playlists)
-
-        for pl in screen_playlists:
-            items = db.query(PlaylistItem).filter(PlaylistItem.playlist_id == pl.id).all()
-            playlist_items.extend(items)
-            for it in items:
+        playlists.extend(screen.playlists)
+        for pl in screen.playlists:
+            for it in pl.items:
                 media_ids.add(it.media_id)
 
     # Allow central/shared playlists to be referenced by active_playlist_id or schedule.playlist_id
@@ -2029,21 +2473,24 @@ def device_config(device_id: str, request: Request, account_id: str | None = Non
         active_id = str(screen.active_playlist_id or "").strip()
         if active_id:
             referenced_playlist_ids.add(active_id)
-    for sc in schedules:
-        pid = str(sc.playlist_id or "").strip()
-        if pid:
-            referenced_playlist_ids.add(pid)
+        for sc in screen.schedules:
+            pid = str(sc.playlist_id or "").strip()
+            if pid:
+                referenced_playlist_ids.add(pid)
 
     missing_referenced_ids = [
         pid for pid in referenced_playlist_ids if pid not in known_playlist_ids
     ]
     if missing_referenced_ids:
-        referenced_playlists = db.query(Playlist).filter(Playlist.id.in_(missing_referenced_ids)).all()
+        referenced_playlists = (
+            db.query(Playlist)
+            .options(selectinload(Playlist.items))
+            .filter(Playlist.id.in_(missing_referenced_ids))
+            .all()
+        )
         playlists.extend(referenced_playlists)
         for pl in referenced_playlists:
-            items = db.query(PlaylistItem).filter(PlaylistItem.playlist_id == pl.id).all()
-            playlist_items.extend(items)
-            for it in items:
+            for it in pl.items:
                 media_ids.add(it.media_id)
 
     media = []
@@ -2051,21 +2498,10 @@ def device_config(device_id: str, request: Request, account_id: str | None = Non
     flash_sale_config = db.query(FlashSaleConfig).filter(FlashSaleConfig.device_id == device.id).first()
     flash_sale_runtime = _resolve_flash_sale_runtime(flash_sale_config, _flash_sale_now())
     flash_sale_runtime = _apply_flash_sale_preload_guard(db, device, flash_sale_runtime)
-    if flash_sale_runtime and flash_sale_runtime.get("products_json"):
-        try:
-            rows = json.loads(flash_sale_runtime["products_json"])
-            if isinstance(rows, list):
-                for row in rows:
-                    if not isinstance(row, dict):
-                        continue
-                    media_id = str(row.get("media_id", "")).strip()
-                    if media_id:
-                        media_ids.add(media_id)
-        except Exception:
-            pass
+    media_ids.update(_flash_sale_media_ids_from_runtime(flash_sale_runtime))
 
     if media_ids:
-        media = db.query(Media).filter(Media.id.in_(list(media_ids))).all()
+        media = _load_media_by_ids(db, media_ids)
 
     media_payload = []
     for m in media:
@@ -2084,10 +2520,10 @@ def device_config(device_id: str, request: Request, account_id: str | None = Non
             }
         )
 
-    return {
-        "device_id": str(device.id),
+    response = FastJSONResponse({
+        "device_id": device_id_str,
         "device": {
-            "id": str(device.id),
+            "id": device_id_str,
             "legacy_id": device.legacy_id,
             "client_ip": device.client_ip,
             "name": device.name,
@@ -2116,7 +2552,7 @@ def device_config(device_id: str, request: Request, account_id: str | None = Non
                         "note": sc.note,
                         "countdown_sec": sc.countdown_sec,
                     }
-                    for sc in schedules if sc.screen_id == s.id
+                    for sc in s.schedules
                 ],
             }
             for s in screens
@@ -2136,11 +2572,12 @@ def device_config(device_id: str, request: Request, account_id: str | None = Non
                         "media_id": str(it.media_id),
                         "duration_sec": it.duration_sec,
                     }
-                    for it in playlist_items if it.playlist_id == pl.id
+                    for it in pl.items
                 ],
             }
             for pl in playlists
         ],
         "media": media_payload,
         "flash_sale": flash_sale_runtime,
-    }
+    })
+    return _with_etag(request, response)
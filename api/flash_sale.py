@@ -1,26 +1,39 @@
 import json
 import math
 import os
-from datetime import datetime, timedelta
+import re
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
-from app.db import SessionLocal
+from app.db import get_db
 from app.models.device import Device
+from app.models.device_cached_media import DeviceCachedMedia
 from app.models.flash_sale import FlashSaleConfig
 from app.models.media import Media
+from app.services.media_verify import mark_media_ids_verified, media_ids_verified
+from app.services.serialization import json_dumps, json_loads
 
 router = APIRouter(prefix="/flash-sale", tags=["flash-sale"])
 DEFAULT_PREFLIGHT_MBPS = float((os.getenv("SIGNAGE_PREFLIGHT_MBPS", "8") or "8").strip())
+_BYTES_PER_MB = 1 << 20
+# Fast paths for well-formed input; anything else goes through the lenient parsers and their error details.
+_TIME_RE = re.compile(r"(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?")
+_DAYS_RE = re.compile(r"[0-6](?:,[0-6])*")
+# Canonical "0,2,5"-style text for every 7-bit weekday mask.
+_DAYS_BY_MASK = tuple(",".join(str(day) for day in range(7) if mask >> day & 1) for mask in range(128))
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def _utcnow() -> datetime:
+    # Naive UTC, matching the stored columns, without the deprecated datetime.utcnow().
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _clean_opt(value: str | None) -> str | None:
+    return (value.strip() or None) if value else None
 
 
 def _normalize_countdown(value: int | None) -> int | None:
@@ -43,6 +56,12 @@ def _normalize_warmup_minutes(value: int | None) -> int | None:
 
 def _normalize_time_hms(value: str) -> str:
     raw = (value or "").strip()
+    match = _TIME_RE.fullmatch(raw)
+    if match:
+        hour, minute, second = int(match[1]), int(match[2]), int(match[3] or 0)
+        if hour > 23 or minute > 59 or second > 59:
+            raise HTTPException(status_code=400, detail="Invalid time range")
+        return f"{hour:02d}:{minute:02d}:{second:02d}"
     parts = raw.split(":")
     if len(parts) not in (2, 3):
         raise HTTPException(status_code=400, detail="Time must be HH:MM or HH:MM:SS")
@@ -70,6 +89,11 @@ def _normalize_schedule_days(values: str) -> str:
     raw = (values or "").strip()
     if not raw:
         raise HTTPException(status_code=400, detail="schedule_days is required")
+    if _DAYS_RE.fullmatch(raw):
+        mask = 0
+        for digit in raw[::2]:
+            mask |= 1 << (ord(digit) - 48)
+        return _DAYS_BY_MASK[mask]
     days: set[int] = set()
     for item in raw.split(","):
         value = item.strip()
@@ -87,14 +111,24 @@ def _normalize_schedule_days(values: str) -> str:
     return ",".join(str(day) for day in sorted(days))
 
 
-def _normalize_products_json(value: str | None, db: Session) -> str:
-    raw = (value or "").strip()
-    if not raw:
-        raise HTTPException(status_code=400, detail="products_json is required")
+_PRODUCT_FIELDS = ("name", "brand", "normal_price", "promo_price", "stock", "media_id")
+
+
+def _decode_products_json(raw: str):
     try:
-        decoded = json.loads(raw)
-    except json.JSONDecodeError as exc:
-        raise HTTPException(status_code=400, detail=f"Invalid products_json: {exc.msg}") from exc
+        return json_loads(raw)
+    except json.JSONDecodeError:
+        # Error path only: retry with stdlib so the 400 detail (and NaN/Infinity handling) stays unchanged.
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError as exc:
+            raise HTTPException(status_code=400, detail=f"Invalid products_json: {exc.msg}") from exc
+
+
+@lru_cache(maxsize=256)
+def _parse_products_json(raw: str) -> tuple[str, frozenset[str]]:
+    """Canonical products JSON plus its media ids; pure in `raw`, so repeat saves skip the parse."""
+    decoded = _decode_products_json(raw)
     if not isinstance(decoded, list):
         raise HTTPException(status_code=400, detail="products_json must be a JSON array")
 
@@ -103,14 +137,7 @@ def _normalize_products_json(value: str | None, db: Session) -> str:
     for index, row in enumerate(decoded):
         if not isinstance(row, dict):
             raise HTTPException(status_code=400, detail=f"products_json[{index}] must be an object")
-        normalized = {
-            "name": str(row.get("name", "")).strip(),
-            "brand": str(row.get("brand", "")).strip(),
-            "normal_price": str(row.get("normal_price", "")).strip(),
-            "promo_price": str(row.get("promo_price", "")).strip(),
-            "stock": str(row.get("stock", "")).strip(),
-            "media_id": str(row.get("media_id", "")).strip(),
-        }
+        normalized = {field: str(row.get(field, "")).strip() for field in _PRODUCT_FIELDS}
         if not normalized["name"]:
             continue
         if not normalized["media_id"]:
@@ -123,29 +150,45 @@ def _normalize_products_json(value: str | None, db: Session) -> str:
 
     if not rows:
         raise HTTPException(status_code=400, detail="products_json must contain at least one product with name")
+    return json_dumps(rows), frozenset(media_ids)
 
-    found_ids = {
-        media_id
-        for (media_id,) in db.query(Media.id).filter(Media.id.in_(list(media_ids))).all()
-    }
-    missing = sorted(media_ids - found_ids)
-    if missing:
+
+def _normalize_products_json(value: str | None, db: Session) -> str:
+    raw = (value or "").strip()
+    if not raw:
+        raise HTTPException(status_code=400, detail="products_json is required")
+    canonical, media_ids = _parse_products_json(raw)
+
+    if media_ids_verified(media_ids):
+        return canonical
+    # The common all-present case only needs a count; ids are fetched just to name the missing ones.
+    found_count = db.execute(
+        select(func.count()).select_from(Media).where(Media.id.in_(media_ids))
+    ).scalar_one()
+    if found_count != len(media_ids):
+        found_ids = set(db.execute(select(Media.id).where(Media.id.in_(media_ids))).scalars())
+        missing = sorted(media_ids - found_ids)
         raise HTTPException(
             status_code=400,
             detail=f"products_json contains unknown media_id: {', '.join(missing)}",
         )
-    return json.dumps(rows, separators=(",", ":"))
+    mark_media_ids_verified(media_ids)
+    return canonical
 
 
 def _find_device_or_404(db: Session, device_id: str) -> Device:
-    item = db.query(Device).get(device_id)
+    item = db.get(Device, device_id)
     if not item:
         raise HTTPException(status_code=404, detail="Device not found")
     return item
 
 
+def _find_config(db: Session, device_id: str) -> FlashSaleConfig | None:
+    return db.scalars(select(FlashSaleConfig).where(FlashSaleConfig.device_id == device_id)).first()
+
+
 def _find_or_create_config(db: Session, device_id: str) -> FlashSaleConfig:
-    config = db.query(FlashSaleConfig).filter(FlashSaleConfig.device_id == device_id).first()
+    config = _find_config(db, device_id)
     if config:
         return config
     config = FlashSaleConfig(device_id=device_id, enabled=True)
@@ -217,33 +260,10 @@ def _apply_schedule_fields(
     config.schedule_end_time = _normalize_time_hms(end_time or "")
 
 
-def _parse_cached_media_ids(csv: str | None) -> set[str]:
-    output: set[str] = set()
-    for item in (csv or "").split(","):
-        value = item.strip()
-        if value:
-            output.add(value)
-    return output
-
-
-def _parse_product_rows(products_json: str) -> list[dict]:
-    try:
-        decoded = json.loads(products_json)
-    except json.JSONDecodeError as exc:
-        raise HTTPException(status_code=400, detail=f"Invalid products_json: {exc.msg}") from exc
-    if not isinstance(decoded, list):
-        raise HTTPException(status_code=400, detail="products_json must be a JSON array")
-    rows: list[dict] = []
-    for row in decoded:
-        if isinstance(row, dict):
-            rows.append(row)
-    return rows
-
-
 @router.get("/device/{device_id}")
 def get_flash_sale(device_id: str, db: Session = Depends(get_db)):
     _find_device_or_404(db, device_id)
-    config = db.query(FlashSaleConfig).filter(FlashSaleConfig.device_id == device_id).first()
+    config = _find_config(db, device_id)
     if not config:
         return {"device_id": device_id, "flash_sale": None}
     return {
@@ -279,7 +299,7 @@ def upsert_flash_sale_now(
     config = _find_or_create_config(db, device_id)
     config.enabled = True
     config.is_draft = False
-    config.note = (note or "").strip() or None
+    config.note = _clean_opt(note)
     config.countdown_sec = _normalize_countdown(countdown_sec)
     config.warmup_minutes = _normalize_warmup_minutes(warmup_minutes)
     config.products_json = _normalize_products_json(products_json, db)
@@ -292,10 +312,10 @@ def upsert_flash_sale_now(
         end_time=None,
         require_all=False,
     )
-    config.activated_at = datetime.utcnow()
-    config.updated_at = datetime.utcnow()
+    now = _utcnow()
+    config.activated_at = now
+    config.updated_at = now
     db.commit()
-    db.refresh(config)
     return {"ok": True, "device_id": device_id}
 
 
@@ -317,7 +337,7 @@ def upsert_flash_sale_schedule(
     config = _find_or_create_config(db, device_id)
     config.enabled = True
     config.is_draft = False
-    config.note = (note or "").strip() or None
+    config.note = _clean_opt(note)
     config.countdown_sec = _normalize_countdown(countdown_sec)
     config.warmup_minutes = _normalize_warmup_minutes(warmup_minutes)
     config.products_json = _normalize_products_json(products_json, db)
@@ -330,10 +350,10 @@ def upsert_flash_sale_schedule(
         end_time=end_time,
         require_all=True,
     )
-    config.activated_at = datetime.utcnow()
-    config.updated_at = datetime.utcnow()
+    now = _utcnow()
+    config.activated_at = now
+    config.updated_at = now
     db.commit()
-    db.refresh(config)
     return {"ok": True, "device_id": device_id}
 
 
@@ -355,7 +375,7 @@ def upsert_flash_sale_draft(
     config = _find_or_create_config(db, device_id)
     config.enabled = False
     config.is_draft = True
-    config.note = (note or "").strip() or None
+    config.note = _clean_opt(note)
     config.countdown_sec = _normalize_countdown(countdown_sec)
     config.warmup_minutes = _normalize_warmup_minutes(warmup_minutes)
     config.products_json = _normalize_products_json(products_json, db)
@@ -369,9 +389,12 @@ def upsert_flash_sale_draft(
         require_all=False,
     )
     config.activated_at = None
-    config.updated_at = datetime.utcnow()
+    # Re-saving an identical draft is a no-op: no UPDATE, and updated_at keeps the runtime cache warm.
+    # A config created above always differs here (its enabled default flips), so it is never dropped.
+    if not db.is_modified(config):
+        return {"ok": True, "device_id": device_id}
+    config.updated_at = _utcnow()
     db.commit()
-    db.refresh(config)
     return {"ok": True, "device_id": device_id}
 
 
@@ -383,32 +406,42 @@ def flash_sale_preflight(
     db: Session = Depends(get_db),
 ):
     device = _find_device_or_404(db, device_id)
-    config = db.query(FlashSaleConfig).filter(FlashSaleConfig.device_id == device_id).first()
+    config = _find_config(db, device_id)
     raw_products = (products_json or "").strip()
     if not raw_products and config:
         raw_products = (config.products_json or "").strip()
     if not raw_products:
         raise HTTPException(status_code=400, detail="products_json is required (query or existing config)")
 
-    normalized_products = _normalize_products_json(raw_products, db)
-    rows = _parse_product_rows(normalized_products)
-    required_ids = {
-        str(row.get("media_id", "")).strip()
-        for row in rows
-        if str(row.get("name", "")).strip() and str(row.get("media_id", "")).strip()
+    _, required_ids = _parse_products_json(raw_products)
+    # One round trip both validates the ids and loads what the missing-media report needs.
+    media_rows = db.execute(
+        select(Media.id, Media.name, Media.type, Media.path, Media.size).where(Media.id.in_(required_ids))
+    ).all()
+    unknown = sorted(required_ids - {row.id for row in media_rows})
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"products_json contains unknown media_id: {', '.join(unknown)}",
+        )
+    cached_ids = {
+        media_id
+        for (media_id,) in db.query(DeviceCachedMedia.media_id)
+        .filter(
+            DeviceCachedMedia.device_id == device.id,
+            DeviceCachedMedia.tier == "normal",
+            DeviceCachedMedia.media_id.in_(required_ids),
+        )
+        .all()
     }
-    cached_ids = _parse_cached_media_ids(device.cached_media_ids)
+    # cached_ids was filtered to required_ids in SQL, so it already is the cached-required subset.
     missing_ids = sorted(required_ids - cached_ids)
-    cached_required_ids = sorted(required_ids & cached_ids)
 
-    missing_media = []
-    missing_total_bytes = 0
-    if missing_ids:
-        missing_media = db.query(Media).filter(Media.id.in_(missing_ids)).all()
-        missing_total_bytes = sum(int(item.size or 0) for item in missing_media)
+    missing_media = [row for row in media_rows if row.id not in cached_ids]
+    missing_total_bytes = sum(int(item.size or 0) for item in missing_media)
 
     mbps = download_mbps if (download_mbps is not None and download_mbps > 0) else DEFAULT_PREFLIGHT_MBPS
-    bytes_per_sec = max(mbps, 0.1) * 1024 * 1024
+    bytes_per_sec = max(mbps, 0.1) * _BYTES_PER_MB
     estimated_sec = round(missing_total_bytes / bytes_per_sec, 2) if missing_total_bytes > 0 else 0.0
     recommended_warmup_minutes = 0
     if estimated_sec > 0:
@@ -418,13 +451,13 @@ def flash_sale_preflight(
         "device_id": str(device.id),
         "ready": len(missing_ids) == 0,
         "required_count": len(required_ids),
-        "cached_required_count": len(cached_required_ids),
+        "cached_required_count": len(cached_ids),
         "missing_count": len(missing_ids),
         "missing_media_ids": missing_ids,
         "missing_total_bytes": missing_total_bytes,
         "download_mbps_used": mbps,
         "estimated_download_sec": estimated_sec,
-        "estimated_download_human": str(timedelta(seconds=int(math.ceil(estimated_sec)))),
+        "estimated_download_human": str(timedelta(seconds=math.ceil(estimated_sec))),
         "recommended_warmup_minutes": recommended_warmup_minutes,
         "configured_warmup_minutes": (config.warmup_minutes if config else None),
         "cache_updated_at": device.media_cache_updated_at.isoformat() if device.media_cache_updated_at else None,
@@ -444,12 +477,14 @@ def flash_sale_preflight(
 @router.delete("/device/{device_id}")
 def disable_flash_sale(device_id: str, db: Session = Depends(get_db)):
     _find_device_or_404(db, device_id)
-    config = db.query(FlashSaleConfig).filter(FlashSaleConfig.device_id == device_id).first()
+    config = _find_config(db, device_id)
     if not config:
         return {"ok": True, "device_id": device_id}
+    if not config.enabled and not config.is_draft:
+        return {"ok": True, "device_id": device_id}
     config.enabled = False
     config.is_draft = False
-    config.updated_at = datetime.utcnow()
+    config.updated_at = _utcnow()
     db.commit()
     return {"ok": True, "device_id": device_id}
 
@@ -457,7 +492,7 @@ def disable_flash_sale(device_id: str, db: Session = Depends(get_db)):
 @router.delete("/device/{device_id}/clear")
 def clear_flash_sale(device_id: str, db: Session = Depends(get_db)):
     _find_device_or_404(db, device_id)
-    config = db.query(FlashSaleConfig).filter(FlashSaleConfig.device_id == device_id).first()
+    config = _find_config(db, device_id)
     if not config:
         return {"ok": True, "device_id": device_id, "cleared": False}
     db.delete(config)
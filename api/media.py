@@ -1,19 +1,38 @@
+import base64
+from datetime import datetime
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.db import SessionLocal
+from sqlalchemy import and_, func, or_
+from app.db import DATABASE_URL, get_db
 from app.models.media import Media
 from app.models.playlist import Playlist, PlaylistItem
+from app.services.serialization import FastJSONResponse
 from app.services.storage import save_file
 
 router = APIRouter(prefix="/media", tags=["media"])
+# SQLite's LIKE already folds ASCII case, exactly what lower() does there, so wrapping the
+# column in lower() only adds a per-row function call. Other backends get a native ILIKE.
+_LIKE_IS_CASE_INSENSITIVE = DATABASE_URL.startswith("sqlite")
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+
+def _icontains(column, lowered_pattern: str):
+    if _LIKE_IS_CASE_INSENSITIVE:
+        return column.like(lowered_pattern)
+    return column.ilike(lowered_pattern)
+
+
+def _media_row(media: Media) -> dict:
+    # Plain dict so read endpoints skip jsonable_encoder's per-attribute walk of ORM instances.
+    return {
+        "id": media.id,
+        "name": media.name,
+        "type": media.type,
+        "path": media.path,
+        "duration_sec": media.duration_sec,
+        "size": media.size,
+        "checksum": media.checksum,
+        "created_at": media.created_at,
+    }
 
 
 def _resolved_media_name(name: str | None, file: UploadFile) -> str:
@@ -43,9 +62,10 @@ def upload_media(
         raise HTTPException(status_code=422, detail=str(exc)) from exc
     media = Media(name=media_name, type=normalized_type, path=f"/{path}", duration_sec=duration_sec, size=size, checksum=checksum)
     db.add(media)
+    db.flush()
+    response = _media_row(media)
     db.commit()
-    db.refresh(media)
-    return media
+    return FastJSONResponse(response)
 
 @router.post("/upload-to-playlist")
 def upload_media_to_playlist(
@@ -58,7 +78,7 @@ def upload_media_to_playlist(
     enabled: bool = True,
     db: Session = Depends(get_db),
 ):
-    playlist = db.query(Playlist).get(playlist_id)
+    playlist = db.get(Playlist, playlist_id)
     if not playlist:
         raise HTTPException(status_code=404, detail="Playlist not found")
 
@@ -73,12 +93,15 @@ def upload_media_to_playlist(
         raise HTTPException(status_code=422, detail=str(exc)) from exc
     media = Media(name=media_name, type=normalized_type, path=f"/{path}", duration_sec=duration_sec, size=size, checksum=checksum)
     db.add(media)
-    db.commit()
-    db.refresh(media)
+    # Flush, not commit: media and item go to disk in one transaction (one fsync).
+    db.flush()
 
     if order is None:
-        max_order = db.query(PlaylistItem.order).filter(PlaylistItem.playlist_id == playlist_id).order_by(PlaylistItem.order.desc()).first()
-        next_order = (max_order[0] + 1) if max_order else 1
+        next_order = (
+            db.query(func.coalesce(func.max(PlaylistItem.order), 0) + 1)
+            .filter(PlaylistItem.playlist_id == playlist_id)
+            .scalar()
+        )
     else:
         next_order = order
 
@@ -90,14 +113,40 @@ def upload_media_to_playlist(
         enabled=enabled,
     )
     db.add(item)
+    db.flush()
+    # Rendered before commit, while both instances are still loaded; expire_on_commit would
+    # otherwise leave the media serialized as an empty object.
+    response = {
+        "media": _media_row(media),
+        "playlist_item": {
+            "id": item.id,
+            "playlist_id": item.playlist_id,
+            "media_id": item.media_id,
+            "order": item.order,
+            "duration_sec": item.duration_sec,
+            "enabled": item.enabled,
+        },
+    }
     db.commit()
-    db.refresh(item)
-
-    return {"media": media, "playlist_item": item}
+    return FastJSONResponse(response)
 
 @router.get("")
 def list_media(db: Session = Depends(get_db)):
-    return db.query(Media).all()
+    return FastJSONResponse([_media_row(media) for media in db.query(Media).all()])
+
+
+def _encode_media_cursor(media: Media) -> str:
+    created_at = media.created_at.isoformat() if media.created_at else ""
+    return base64.urlsafe_b64encode(f"{created_at}|{media.id}".encode("utf-8")).decode("ascii")
+
+
+def _decode_media_cursor(cursor: str) -> tuple[datetime | None, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, media_id = raw.split("|", 1)
+        return (datetime.fromisoformat(created_at) if created_at else None), media_id
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
 
 
 @router.get("/page")
@@ -106,6 +155,7 @@ def list_media_page(
     limit: int = 100,
     q: str | None = None,
     type: str | None = None,
+    cursor: str | None = None,
     db: Session = Depends(get_db),
 ):
     safe_offset = max(0, offset)
@@ -119,34 +169,53 @@ def list_media_page(
     if q:
         keyword = f"%{q.strip().lower()}%"
         if keyword != "%%":
+            query = query.filter(_icontains(Media.name, keyword) | _icontains(Media.path, keyword))
+
+    total = None
+    if cursor:
+        # Keyset mode: seek past the last row of the previous page instead of counting and skipping.
+        # NULL created_at sorts last under DESC, so those rows follow every dated one.
+        cursor_created_at, cursor_id = _decode_media_cursor(cursor)
+        if cursor_created_at is None:
+            query = query.filter(Media.created_at.is_(None), Media.id < cursor_id)
+        else:
             query = query.filter(
-                func.lower(Media.name).like(keyword) | func.lower(Media.path).like(keyword)
+                or_(
+                    Media.created_at < cursor_created_at,
+                    and_(Media.created_at == cursor_created_at, Media.id < cursor_id),
+                    Media.created_at.is_(None),
+                )
             )
-
-    total = query.count()
-    items = (
+        safe_offset = 0
+    else:
+        total = query.count()
+    rows = (
         query.order_by(Media.created_at.desc(), Media.id.desc())
         .offset(safe_offset)
-        .limit(safe_limit)
+        .limit(safe_limit + 1)
         .all()
     )
-    return {
-        "items": items,
+    items = rows[:safe_limit]
+    has_more = len(rows) > safe_limit
+    return FastJSONResponse({
+        "items": [_media_row(media) for media in items],
         "total": total,
         "offset": safe_offset,
         "limit": safe_limit,
-    }
+        "has_more": has_more,
+        "next_cursor": _encode_media_cursor(items[-1]) if has_more else None,
+    })
 
 @router.get("/{media_id}")
 def get_media(media_id: str, db: Session = Depends(get_db)):
-    media = db.query(Media).get(media_id)
+    media = db.get(Media, media_id)
     if not media:
         raise HTTPException(status_code=404, detail="Media not found")
-    return media
+    return FastJSONResponse(_media_row(media))
 
 @router.delete("/{media_id}")
 def delete_media(media_id: str, db: Session = Depends(get_db)):
-    media = db.query(Media).get(media_id)
+    media = db.get(Media, media_id)
     if not media:
         raise HTTPException(status_code=404, detail="Media not found")
     db.delete(media)
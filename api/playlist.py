@@ -1,23 +1,20 @@
 import json
+from functools import lru_cache
 
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import delete, update
 from sqlalchemy.orm import Session
-from app.db import SessionLocal
+from app.db import get_db
 from app.models.playlist import Playlist, PlaylistItem
 from app.models.media import Media
 from app.models.schedule import Schedule
 from app.models.screen import Screen
 from app.models.device import Device
+from app.services.media_verify import mark_media_ids_verified, media_ids_verified
+from app.services.serialization import FastJSONResponse
 
 router = APIRouter(prefix="/playlists", tags=["playlists"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 
 def _normalize_countdown(value: int | None) -> int | None:
     if value is None:
@@ -36,13 +33,9 @@ def _normalize_entity_id(value: str, field_name: str) -> str:
     return normalized
 
 
-def _normalize_flash_items_json(
-    value: str | None,
-    db: Session,
-) -> str | None:
-    raw = (value or "").strip()
-    if not raw:
-        return None
+@lru_cache(maxsize=1024)
+def _parse_flash_items_json(raw: str) -> tuple[str, frozenset[str]]:
+    """Canonical flash items JSON plus its media ids; pure in `raw`, so repeat saves skip the parse."""
     try:
         decoded = json.loads(raw)
     except json.JSONDecodeError as exc:
@@ -72,8 +65,19 @@ def _normalize_flash_items_json(
             )
         normalized_rows.append(normalized)
         media_ids.add(normalized["media_id"])
+    return json.dumps(normalized_rows, separators=(",", ":")), frozenset(media_ids)
+
+
+def _normalize_flash_items_json(
+    value: str | None,
+    db: Session,
+) -> str | None:
+    raw = (value or "").strip()
+    if not raw:
+        return None
+    canonical, media_ids = _parse_flash_items_json(raw)
 
-    if media_ids:
+    if media_ids and not media_ids_verified(media_ids):
         found = {
             row[0]
             for row in db.query(Media.id).filter(Media.id.in_(list(media_ids))).all()
@@ -84,7 +88,8 @@ def _normalize_flash_items_json(
                 status_code=400,
                 detail=f"flash_items_json contains unknown media_id: {', '.join(missing)}",
             )
-    return json.dumps(normalized_rows, separators=(",", ":"))
+        mark_media_ids_verified(media_ids)
+    return canonical
 
 
 def _normalize_media_type(value: str | None) -> str:
@@ -94,6 +99,40 @@ def _normalize_media_type(value: str | None) -> str:
     return media_type
 
 
+_PLAYLIST_ITEM_COLUMNS = (
+    PlaylistItem.id,
+    PlaylistItem.playlist_id,
+    PlaylistItem.media_id,
+    PlaylistItem.order,
+    PlaylistItem.duration_sec,
+    PlaylistItem.enabled,
+)
+
+
+def _playlist_row(playlist: Playlist) -> dict:
+    return {
+        "id": playlist.id,
+        "screen_id": playlist.screen_id,
+        "name": playlist.name,
+        "is_flash_sale": playlist.is_flash_sale,
+        "flash_note": playlist.flash_note,
+        "flash_countdown_sec": playlist.flash_countdown_sec,
+        "flash_items_json": playlist.flash_items_json,
+    }
+
+
+def _playlist_item_row(item) -> dict:
+    """Response dict for a PlaylistItem instance or a row selected/returned with its columns."""
+    return {
+        "id": item.id,
+        "playlist_id": item.playlist_id,
+        "media_id": item.media_id,
+        "order": item.order,
+        "duration_sec": item.duration_sec,
+        "enabled": item.enabled,
+    }
+
+
 def _playlist_media_type(db: Session, playlist_id: str) -> str | None:
     row = (
         db.query(Media.type)
@@ -126,9 +165,10 @@ def create_playlist(
         flash_items_json=_normalize_flash_items_json(flash_items_json, db),
     )
     db.add(playlist)
+    db.flush()
+    response = _playlist_row(playlist)
     db.commit()
-    db.refresh(playlist)
-    return playlist
+    return FastJSONResponse(response)
 
 @router.get("")
 def list_playlists(
@@ -144,34 +184,25 @@ def list_playlists(
     rows = query.order_by(Playlist.name.asc(), Playlist.id.asc()).all()
 
     if not rows:
-        return []
+        return FastJSONResponse([])
 
     screen_ids = sorted({str(item.screen_id) for item in rows if item.screen_id})
-    screen_map: dict[str, Screen] = {}
+    # One narrow join instead of loading whole Screen and Device rows (the device row carries the
+    # cached-media CSV columns) just for two names.
+    screen_map: dict[str, tuple] = {}
     if screen_ids:
         screen_map = {
-            str(item.id): item
-            for item in db.query(Screen).filter(Screen.id.in_(screen_ids)).all()
-        }
-
-    device_ids = sorted(
-        {
-            str(item.device_id)
-            for item in screen_map.values()
-            if getattr(item, "device_id", None)
-        }
-    )
-    device_map: dict[str, Device] = {}
-    if device_ids:
-        device_map = {
-            str(item.id): item
-            for item in db.query(Device).filter(Device.id.in_(device_ids)).all()
+            str(screen_id): (screen_name, device_id, device_name)
+            for screen_id, screen_name, device_id, device_name in (
+                db.query(Screen.id, Screen.name, Device.id, Device.name)
+                .outerjoin(Device, Device.id == Screen.device_id)
+                .filter(Screen.id.in_(screen_ids))
+            )
         }
 
     output: list[dict] = []
     for item in rows:
-        screen = screen_map.get(str(item.screen_id))
-        device = device_map.get(str(screen.device_id)) if screen else None
+        screen_name, device_id, device_name = screen_map.get(str(item.screen_id), (None, None, None))
         output.append(
             {
                 "id": item.id,
@@ -181,12 +212,12 @@ def list_playlists(
                 "flash_note": item.flash_note,
                 "flash_countdown_sec": item.flash_countdown_sec,
                 "flash_items_json": item.flash_items_json,
-                "device_id": str(device.id) if device else None,
-                "device_name": (device.name if device else None),
-                "screen_name": (screen.name if screen else None),
+                "device_id": str(device_id) if device_id else None,
+                "device_name": device_name if device_id else None,
+                "screen_name": screen_name,
             }
         )
-    return output
+    return FastJSONResponse(output)
 
 @router.put("/{playlist_id}")
 def update_playlist(
@@ -199,7 +230,7 @@ def update_playlist(
     db: Session = Depends(get_db),
 ):
     playlist_id = _normalize_entity_id(playlist_id, "playlist_id")
-    playlist = db.query(Playlist).get(playlist_id)
+    playlist = db.get(Playlist, playlist_id)
     if not playlist:
         raise HTTPException(status_code=404, detail="Playlist not found")
     if name is not None:
@@ -215,14 +246,14 @@ def update_playlist(
         playlist.flash_countdown_sec = _normalize_countdown(flash_countdown_sec)
     if flash_items_json is not None:
         playlist.flash_items_json = _normalize_flash_items_json(flash_items_json, db)
+    response = _playlist_row(playlist)
     db.commit()
-    db.refresh(playlist)
-    return playlist
+    return FastJSONResponse(response)
 
 @router.delete("/{playlist_id}")
 def delete_playlist(playlist_id: str, db: Session = Depends(get_db)):
     playlist_id = _normalize_entity_id(playlist_id, "playlist_id")
-    playlist = db.query(Playlist).get(playlist_id)
+    playlist = db.get(Playlist, playlist_id)
     if not playlist:
         raise HTTPException(status_code=404, detail="Playlist not found")
     db.query(PlaylistItem).filter(PlaylistItem.playlist_id == playlist_id).delete(synchronize_session=False)
@@ -239,10 +270,10 @@ def delete_playlist(playlist_id: str, db: Session = Depends(get_db)):
 def add_item(playlist_id: str, media_id: str, order: int, duration_sec: int | None = None, enabled: bool = True, db: Session = Depends(get_db)):
     playlist_id = _normalize_entity_id(playlist_id, "playlist_id")
     media_id = _normalize_entity_id(media_id, "media_id")
-    playlist = db.query(Playlist).get(playlist_id)
+    playlist = db.get(Playlist, playlist_id)
     if not playlist:
         raise HTTPException(status_code=404, detail="Playlist not found")
-    media = db.query(Media).get(media_id)
+    media = db.get(Media, media_id)
     if not media:
         raise HTTPException(status_code=404, detail="Media not found")
 
@@ -259,45 +290,58 @@ def add_item(playlist_id: str, media_id: str, order: int, duration_sec: int | No
 
     item = PlaylistItem(playlist_id=playlist_id, media_id=media_id, order=order, duration_sec=duration_sec, enabled=enabled)
     db.add(item)
+    db.flush()
+    response = _playlist_item_row(item)
     db.commit()
-    db.refresh(item)
-    return item
+    return FastJSONResponse(response)
 
 @router.get("/{playlist_id}/items")
 def list_items(playlist_id: str, db: Session = Depends(get_db)):
     playlist_id = _normalize_entity_id(playlist_id, "playlist_id")
-    playlist = db.query(Playlist).get(playlist_id)
+    playlist = db.get(Playlist, playlist_id)
     if not playlist:
         raise HTTPException(status_code=404, detail="Playlist not found")
-    return (
+    items = (
         db.query(PlaylistItem)
         .filter(PlaylistItem.playlist_id == playlist_id)
         .order_by(PlaylistItem.order.asc(), PlaylistItem.id.asc())
         .all()
     )
+    return FastJSONResponse([_playlist_item_row(item) for item in items])
 
 @router.put("/items/{item_id}")
 def update_item(item_id: str, order: int | None = None, duration_sec: int | None = None, enabled: bool | None = None, db: Session = Depends(get_db)):
     item_id = _normalize_entity_id(item_id, "item_id")
-    item = db.query(PlaylistItem).get(item_id)
-    if not item:
-        raise HTTPException(status_code=404, detail="Playlist item not found")
+    values = {}
     if order is not None:
-        item.order = order
+        values["order"] = order
     if duration_sec is not None:
-        item.duration_sec = duration_sec
+        values["duration_sec"] = duration_sec
     if enabled is not None:
-        item.enabled = enabled
+        values["enabled"] = enabled
+    if not values:
+        item = db.get(PlaylistItem, item_id)
+    else:
+        # UPDATE ... RETURNING: existence check, write and response row in one statement.
+        item = db.execute(
+            update(PlaylistItem)
+            .where(PlaylistItem.id == item_id)
+            .values(values)
+            .returning(*_PLAYLIST_ITEM_COLUMNS)
+        ).first()
+    if not item:
+        raise HTTPException(status_code=404, detail="Playlist item not found")
+    response = _playlist_item_row(item)
     db.commit()
-    db.refresh(item)
-    return item
+    return FastJSONResponse(response)
 
 @router.delete("/items/{item_id}")
 def delete_item(item_id: str, db: Session = Depends(get_db)):
     item_id = _normalize_entity_id(item_id, "item_id")
-    item = db.query(PlaylistItem).get(item_id)
-    if not item:
+    deleted = db.execute(
+        delete(PlaylistItem).where(PlaylistItem.id == item_id).returning(PlaylistItem.id)
+    ).first()
+    if not deleted:
         raise HTTPException(status_code=404, detail="Playlist item not found")
-    db.delete(item)
     db.commit()
     return {"ok": True}
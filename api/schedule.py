@@ -1,18 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
 from datetime import time
+from sqlalchemy import delete, exists
 from sqlalchemy.orm import Session
-from app.db import SessionLocal
+from app.db import get_db
 from app.models.schedule import Schedule
+from app.services.serialization import FastJSONResponse
 
 router = APIRouter(prefix="/schedules", tags=["schedules"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 
 def _parse_time(value: str) -> time:
     try:
@@ -41,11 +36,24 @@ def _validate_no_overlap(
     if exclude_id is not None:
         conditions.append(Schedule.id != exclude_id)
 
-    overlap = db.query(Schedule).filter(*conditions).first()
-    if overlap:
+    # EXISTS answers from the screen/day/time index without materializing a Schedule row.
+    if db.query(exists().where(*conditions)).scalar():
         raise HTTPException(status_code=400, detail="Schedule overlaps with an existing entry.")
 
 
+def _schedule_row(schedule: Schedule) -> dict:
+    return {
+        "id": schedule.id,
+        "screen_id": schedule.screen_id,
+        "playlist_id": schedule.playlist_id,
+        "day_of_week": schedule.day_of_week,
+        "start_time": schedule.start_time,
+        "end_time": schedule.end_time,
+        "note": schedule.note,
+        "countdown_sec": schedule.countdown_sec,
+    }
+
+
 def _normalize_countdown(countdown_sec: int | None) -> int | None:
     if countdown_sec is None:
         return None
@@ -78,13 +86,15 @@ def create_schedule(
         countdown_sec=_normalize_countdown(countdown_sec),
     )
     db.add(schedule)
+    db.flush()
+    response = _schedule_row(schedule)
     db.commit()
-    db.refresh(schedule)
-    return schedule
+    return FastJSONResponse(response)
 
 @router.get("")
 def list_schedules(screen_id: str, db: Session = Depends(get_db)):
-    return db.query(Schedule).filter(Schedule.screen_id == screen_id).all()
+    schedules = db.query(Schedule).filter(Schedule.screen_id == screen_id).all()
+    return FastJSONResponse([_schedule_row(schedule) for schedule in schedules])
 
 @router.put("/{schedule_id}")
 def update_schedule(
@@ -97,7 +107,7 @@ def update_schedule(
     countdown_sec: int | None = None,
     db: Session = Depends(get_db),
 ):
-    schedule = db.query(Schedule).get(schedule_id)
+    schedule = db.get(Schedule, schedule_id)
     if not schedule:
         raise HTTPException(status_code=404, detail="Schedule not found")
 
@@ -115,15 +125,14 @@ def update_schedule(
         schedule.note = note.strip() or None
     if countdown_sec is not None:
         schedule.countdown_sec = _normalize_countdown(countdown_sec)
+    response = _schedule_row(schedule)
     db.commit()
-    db.refresh(schedule)
-    return schedule
+    return FastJSONResponse(response)
 
 @router.delete("/{schedule_id}")
 def delete_schedule(schedule_id: str, db: Session = Depends(get_db)):
-    schedule = db.query(Schedule).get(schedule_id)
-    if not schedule:
+    deleted = db.execute(delete(Schedule).where(Schedule.id == schedule_id).returning(Schedule.id)).first()
+    if not deleted:
         raise HTTPException(status_code=404, detail="Schedule not found")
-    db.delete(schedule)
     db.commit()
     return {"ok": True}
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app.db import SessionLocal
+from app.db import get_db
 from app.models.device import Device
 from app.models.screen import Screen
+from app.services.serialization import FastJSONResponse
 
 router = APIRouter(prefix="/screens", tags=["screens"])
 DEFAULT_TRANSITION_DURATION_SEC = 1
@@ -10,26 +11,12 @@ MIN_TRANSITION_DURATION_SEC = 0
 MAX_TRANSITION_DURATION_SEC = 30
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Every legal preset, 1x1..4x4, mapped to (rows, cols); anything else is rejected.
+_GRID_PRESETS = {f"{rows}x{cols}": (rows, cols) for rows in range(1, 5) for cols in range(1, 5)}
 
 
 def _parse_grid_preset(value: str) -> tuple[int, int] | None:
-    preset = (value or "").strip().lower()
-    if "x" not in preset:
-        return None
-    parts = preset.split("x")
-    if len(parts) != 2:
-        return None
-    rows = int(parts[0]) if parts[0].isdigit() else -1
-    cols = int(parts[1]) if parts[1].isdigit() else -1
-    if rows < 1 or cols < 1 or rows > 4 or cols > 4:
-        return None
-    return rows, cols
+    return _GRID_PRESETS.get((value or "").strip().lower())
 
 
 def _validate_grid_for_device(device: Device, grid_preset: str) -> str:
@@ -89,7 +76,7 @@ def create_screen(
     transition_duration_sec: int = DEFAULT_TRANSITION_DURATION_SEC,
     db: Session = Depends(get_db),
 ):
-    device = db.query(Device).get(device_id)
+    device = db.get(Device, device_id)
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
     screen = Screen(
@@ -100,15 +87,16 @@ def create_screen(
         transition_duration_sec=_validate_transition_duration(transition_duration_sec),
     )
     db.add(screen)
+    db.flush()
+    response = _screen_response(screen)
     db.commit()
-    db.refresh(screen)
-    return _screen_response(screen)
+    return FastJSONResponse(response)
 
 
 @router.get("")
 def list_screens(device_id: str, db: Session = Depends(get_db)):
     screens = db.query(Screen).filter(Screen.device_id == device_id).all()
-    return [_screen_response(screen) for screen in screens]
+    return FastJSONResponse([_screen_response(screen) for screen in screens])
 
 
 @router.put("/{screen_id}")
@@ -120,10 +108,10 @@ def update_screen(
     transition_duration_sec: int | None = None,
     db: Session = Depends(get_db),
 ):
-    screen = db.query(Screen).get(screen_id)
+    screen = db.get(Screen, screen_id)
     if not screen:
         raise HTTPException(status_code=404, detail="Screen not found")
-    device = db.query(Device).get(screen.device_id)
+    device = db.get(Device, screen.device_id)
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
     if name is not None:
@@ -134,14 +122,14 @@ def update_screen(
         screen.grid_preset = _validate_grid_for_device(device, grid_preset)
     if transition_duration_sec is not None:
         screen.transition_duration_sec = _validate_transition_duration(transition_duration_sec)
+    response = _screen_response(screen)
     db.commit()
-    db.refresh(screen)
-    return _screen_response(screen)
+    return FastJSONResponse(response)
 
 
 @router.delete("/{screen_id}")
 def delete_screen(screen_id: str, db: Session = Depends(get_db)):
-    screen = db.query(Screen).get(screen_id)
+    screen = db.get(Screen, screen_id)
     if not screen:
         raise HTTPException(status_code=404, detail="Screen not found")
     db.delete(screen)
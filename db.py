@@ -1,6 +1,8 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy import text
+import hashlib
+import inspect
 import os
 import re
 
@@ -9,6 +11,20 @@ DATABASE_URL = "sqlite:///./signage.db"  # ganti ke postgres nanti
 POOL_SIZE = int(os.getenv("SIGNAGE_DB_POOL_SIZE", "15"))
 MAX_OVERFLOW = int(os.getenv("SIGNAGE_DB_MAX_OVERFLOW", "30"))
 POOL_TIMEOUT = int(os.getenv("SIGNAGE_DB_POOL_TIMEOUT", "60"))
+POOL_RECYCLE_SEC = int(os.getenv("SIGNAGE_DB_POOL_RECYCLE_SEC", "3600"))
+# Compiled-statement LRU; the default (500) churns once every endpoint's query shapes are warm.
+QUERY_CACHE_SIZE = int(os.getenv("SIGNAGE_DB_QUERY_CACHE_SIZE", "1200"))
+# SQLite tuning applied on every new pooled connection. WAL lets readers run alongside the
+# single writer and, with synchronous=NORMAL, commits stop paying an fsync each (durability
+# after power loss is at checkpoint granularity; the file itself stays consistent).
+SQLITE_JOURNAL_MODE = os.getenv("SIGNAGE_SQLITE_JOURNAL_MODE", "WAL").strip()
+SQLITE_SYNCHRONOUS = os.getenv("SIGNAGE_SQLITE_SYNCHRONOUS", "NORMAL").strip()
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SIGNAGE_SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SIGNAGE_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+# Only inserts into the patched tables change the fingerprint, not rows edited in place
+# between boots (API writes already store normalized values); set to 0 to force the full
+# patch/normalization pass on every start.
+SCHEMA_FINGERPRINT_SKIP = os.getenv("SIGNAGE_SCHEMA_FINGERPRINT_SKIP", "1").strip().lower() in {"1", "true", "yes", "on"}
 
 engine = create_engine(
     DATABASE_URL,
@@ -17,9 +33,44 @@ engine = create_engine(
     max_overflow=MAX_OVERFLOW,
     pool_timeout=POOL_TIMEOUT,
     pool_pre_ping=True,
+    pool_recycle=POOL_RECYCLE_SEC,
+    query_cache_size=QUERY_CACHE_SIZE,
 )
+
+
+@event.listens_for(engine, "connect")
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    if not DATABASE_URL.startswith("sqlite"):
+        return
+    pragmas = [
+        ("journal_mode", SQLITE_JOURNAL_MODE),
+        ("synchronous", SQLITE_SYNCHRONOUS),
+        ("temp_store", "MEMORY"),
+        ("cache_size", str(-SQLITE_CACHE_SIZE_KB)),
+        ("mmap_size", str(SQLITE_MMAP_SIZE)),
+    ]
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas:
+            # Values come from env; PRAGMA takes no bind parameters, so only plain words/numbers pass.
+            if value and re.fullmatch(r"-?\w+", value):
+                cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
+
+def get_db():
+    """Request-scoped session dependency shared by every router."""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
 Base = declarative_base()
 
 
@@ -29,242 +80,363 @@ def ensure_sqlite_schema():
 
     `Base.metadata.create_all()` won't add new columns to existing tables.
     This keeps local/dev installs working without requiring Alembic.
+
+    The patch pass scans and rewrites whole tables, so its outcome is fingerprinted and
+    the pass is skipped on boots where neither the schema, the newest row of any patched
+    table nor the patch code itself changed since the last run.
     """
     if not DATABASE_URL.startswith("sqlite"):
         return
 
     with engine.begin() as conn:
-        cols = conn.execute(text("PRAGMA table_info(device)")).fetchall()
-        col_names = {row[1] for row in cols}  # (cid, name, type, notnull, dflt_value, pk)
-        if "orientation" not in col_names:
-            conn.execute(text("ALTER TABLE device ADD COLUMN orientation VARCHAR DEFAULT 'portrait'"))
-        if "media_quality_tier" not in col_names:
-            conn.execute(text("ALTER TABLE device ADD COLUMN media_quality_tier VARCHAR DEFAULT 'normal'"))
-        if "owner_account" not in col_names:
-            conn.execute(text("ALTER TABLE device ADD COLUMN owner_account VARCHAR"))
-        if "legacy_id" not in col_names:
-            conn.execute(text("ALTER TABLE device ADD COLUMN legacy_id VARCHAR"))
-        if "client_ip" not in col_names:
-            conn.execute(text("ALTER TABLE device ADD COLUMN client_ip VARCHAR"))
-        if "cached_media_ids" not in col_names:
-            conn.execute(text("ALTER TABLE device ADD COLUMN cached_media_ids TEXT"))
-        if "cached_media_low_ids" not in col_names:
-            conn.execute(text("ALTER TABLE device ADD COLUMN cached_media_low_ids TEXT"))
-        if "cached_media_high_ids" not in col_names:
-            conn.execute(text("ALTER TABLE device ADD COLUMN cached_media_high_ids TEXT"))
-        if "media_cache_updated_at" not in col_names:
-            conn.execute(text("ALTER TABLE device ADD COLUMN media_cache_updated_at DATETIME"))
-        duplicate_ip_rows = conn.execute(
-            text(
-                "SELECT id, client_ip FROM device "
-                "WHERE client_ip IS NOT NULL AND trim(client_ip) <> '' "
-                "ORDER BY rowid ASC"
-            )
-        ).fetchall()
-        seen_ips: set[str] = set()
-        for device_id, client_ip in duplicate_ip_rows:
-            normalized_ip = (client_ip or "").strip()
-            if not normalized_ip:
-                continue
-            if normalized_ip in seen_ips:
-                conn.execute(
-                    text("UPDATE device SET client_ip=NULL WHERE id=:id"),
-                    {"id": device_id},
-                )
-            else:
-                seen_ips.add(normalized_ip)
-        try:
+        conn.execute(
+            text("CREATE TABLE IF NOT EXISTS schema_meta (key VARCHAR PRIMARY KEY, value VARCHAR NOT NULL)")
+        )
+        if SCHEMA_FINGERPRINT_SKIP:
+            stored = conn.execute(text("SELECT value FROM schema_meta WHERE key='fingerprint'")).scalar()
+            if stored is not None and stored == _schema_fingerprint(conn):
+                return
+        _patch_sqlite_schema(conn)
+        fingerprint = _schema_fingerprint(conn)
+        if fingerprint is not None:
             conn.execute(
-                text(
-                    "CREATE UNIQUE INDEX IF NOT EXISTS ux_device_client_ip "
-                    "ON device(client_ip) "
-                    "WHERE client_ip IS NOT NULL AND trim(client_ip) <> ''"
-                )
+                text("INSERT OR REPLACE INTO schema_meta (key, value) VALUES ('fingerprint', :value)"),
+                {"value": fingerprint},
             )
-        except Exception:
-            pass
 
-        if "orientation" in col_names or cols:
-            conn.execute(text("UPDATE device SET orientation='portrait' WHERE orientation IS NULL OR orientation=''"))
+
+def _schema_fingerprint(conn) -> str | None:
+    """Digest of the patch code, the schema version and max(rowid) of each patched table."""
+    if _PATCH_SOURCE_DIGEST is None:
+        return None
+    digest = hashlib.sha1(_PATCH_SOURCE_DIGEST.encode("ascii"))
+    digest.update(str(conn.execute(text("PRAGMA schema_version")).scalar()).encode("ascii"))
+    existing = set(
+        conn.execute(text("SELECT name FROM sqlite_master WHERE type='table'")).scalars().all()
+    )
+    for table_name in _PATCHED_TABLES:
+        if table_name not in existing:
+            digest.update(f"|{table_name}:-".encode("utf-8"))
+            continue
+        # max(rowid) is a single b-tree seek, unlike count(*), so boot cost does not grow with data.
+        max_rowid = conn.execute(text(f'SELECT max(rowid) FROM "{table_name}"')).scalar()
+        digest.update(f"|{table_name}:{max_rowid}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _patch_sqlite_schema(conn) -> None:
+    cols = conn.execute(text("PRAGMA table_info(device)")).fetchall()
+    col_names = {row[1] for row in cols}  # (cid, name, type, notnull, dflt_value, pk)
+    if "orientation" not in col_names:
+        conn.execute(text("ALTER TABLE device ADD COLUMN orientation VARCHAR DEFAULT 'portrait'"))
+    if "media_quality_tier" not in col_names:
+        conn.execute(text("ALTER TABLE device ADD COLUMN media_quality_tier VARCHAR DEFAULT 'normal'"))
+    if "owner_account" not in col_names:
+        conn.execute(text("ALTER TABLE device ADD COLUMN owner_account VARCHAR"))
+    if "legacy_id" not in col_names:
+        conn.execute(text("ALTER TABLE device ADD COLUMN legacy_id VARCHAR"))
+    if "client_ip" not in col_names:
+        conn.execute(text("ALTER TABLE device ADD COLUMN client_ip VARCHAR"))
+    if "cached_media_ids" not in col_names:
+        conn.execute(text("ALTER TABLE device ADD COLUMN cached_media_ids TEXT"))
+    if "cached_media_low_ids" not in col_names:
+        conn.execute(text("ALTER TABLE device ADD COLUMN cached_media_low_ids TEXT"))
+    if "cached_media_high_ids" not in col_names:
+        conn.execute(text("ALTER TABLE device ADD COLUMN cached_media_high_ids TEXT"))
+    if "media_cache_updated_at" not in col_names:
+        conn.execute(text("ALTER TABLE device ADD COLUMN media_cache_updated_at DATETIME"))
+    duplicate_ip_rows = conn.execute(
+        text(
+            "SELECT id, client_ip FROM device "
+            "WHERE client_ip IS NOT NULL AND trim(client_ip) <> '' "
+            "ORDER BY rowid ASC"
+        )
+    ).fetchall()
+    seen_ips: set[str] = set()
+    for device_id, client_ip in duplicate_ip_rows:
+        normalized_ip = (client_ip or "").strip()
+        if not normalized_ip:
+            continue
+        if normalized_ip in seen_ips:
+            conn.execute(
+                text("UPDATE device SET client_ip=NULL WHERE id=:id"),
+                {"id": device_id},
+            )
+        else:
+            seen_ips.add(normalized_ip)
+    try:
         conn.execute(
             text(
-                "UPDATE device SET media_quality_tier='normal' "
-                "WHERE media_quality_tier IS NULL OR trim(media_quality_tier)='' "
-                "OR lower(trim(media_quality_tier)) NOT IN ('low','normal','high')"
+                "CREATE UNIQUE INDEX IF NOT EXISTS ux_device_client_ip "
+                "ON device(client_ip) "
+                "WHERE client_ip IS NOT NULL AND trim(client_ip) <> ''"
             )
         )
+    except Exception:
+        pass
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_device_legacy_id ON device(legacy_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_device_owner_account ON device(owner_account)"))
 
-        device_rows = conn.execute(text("SELECT id FROM device ORDER BY rowid ASC")).fetchall()
-        id_values = [row[0] for row in device_rows if row and row[0]]
-        existing_simple = {
-            int(match.group(1))
-            for value in id_values
-            for match in [re.fullmatch(r"Device-(\d{4,})", str(value))]
-            if match is not None
-        }
-        next_seq = (max(existing_simple) + 1) if existing_simple else 1
-        used_ids = set(str(value) for value in id_values)
-
-        for old_id in id_values:
-            old = str(old_id)
-            if re.fullmatch(r"Device-(\d{4,})", old):
-                continue
-            candidate = f"Device-{next_seq:04d}"
-            while candidate in used_ids:
-                next_seq += 1
-                candidate = f"Device-{next_seq:04d}"
-            next_seq += 1
+    if "orientation" in col_names or cols:
+        conn.execute(text("UPDATE device SET orientation='portrait' WHERE orientation IS NULL OR orientation=''"))
+    conn.execute(
+        text(
+            "UPDATE device SET media_quality_tier='normal' "
+            "WHERE media_quality_tier IS NULL OR trim(media_quality_tier)='' "
+            "OR lower(trim(media_quality_tier)) NOT IN ('low','normal','high')"
+        )
+    )
 
-            conn.execute(
-                text("UPDATE device SET id=:new_id, legacy_id=:legacy WHERE id=:old_id"),
-                {"new_id": candidate, "legacy": old, "old_id": old},
-            )
-            conn.execute(
-                text("UPDATE screen SET device_id=:new_id WHERE device_id=:old_id"),
-                {"new_id": candidate, "old_id": old},
+    # Renumber every id that is not already `Device-NNNN` (4+ digits) in one pass: new numbers
+    # continue after the highest existing one, in rowid order, and screen rows are repointed
+    # first while the old ids are still in place.
+    simple_id = "(id GLOB 'Device-[0-9][0-9][0-9][0-9]*' AND substr(id, 8) NOT GLOB '*[^0-9]*')"
+    renum_cte = (
+        "WITH renum AS ("
+        "SELECT id AS old_id, printf('Device-%04d', "
+        f"(SELECT coalesce(max(CAST(substr(id, 8) AS INTEGER)), 0) FROM device WHERE {simple_id}) "
+        "+ ROW_NUMBER() OVER (ORDER BY rowid)) AS new_id "
+        f"FROM device WHERE id <> '' AND NOT {simple_id}) "
+    )
+    conn.execute(
+        text(
+            renum_cte + "UPDATE screen SET device_id=(SELECT new_id FROM renum WHERE old_id=screen.device_id) "
+            "WHERE device_id IN (SELECT old_id FROM renum)"
+        )
+    )
+    conn.execute(
+        text(
+            renum_cte + "UPDATE device SET legacy_id=id, id=(SELECT new_id FROM renum WHERE old_id=device.id) "
+            "WHERE id IN (SELECT old_id FROM renum)"
+        )
+    )
+
+    media_cols = conn.execute(text("PRAGMA table_info(media)")).fetchall()
+    media_col_names = {row[1] for row in media_cols}
+    if {"id", "name", "path"}.issubset(media_col_names):
+        rows = conn.execute(
+            text(
+                "SELECT id, name, path FROM media "
+                "WHERE name IS NULL OR trim(name)='' OR lower(trim(name))='unnamed'"
             )
-            used_ids.add(candidate)
-            used_ids.discard(old)
+        ).fetchall()
+        renamed = [
+            {
+                "name": os.path.basename((media_path or "").replace("\\", "/")).strip() or f"media-{media_id}",
+                "id": media_id,
+            }
+            for media_id, _name, media_path in rows
+        ]
+        if renamed:
+            # One executemany instead of a statement round-trip per row.
+            conn.execute(text("UPDATE media SET name=:name WHERE id=:id"), renamed)
 
-        media_cols = conn.execute(text("PRAGMA table_info(media)")).fetchall()
-        media_col_names = {row[1] for row in media_cols}
-        if {"id", "name", "path"}.issubset(media_col_names):
-            rows = conn.execute(
-                text(
-                    "SELECT id, name, path FROM media "
-                    "WHERE name IS NULL OR trim(name)='' OR lower(trim(name))='unnamed'"
-                )
-            ).fetchall()
-            for media_id, _name, media_path in rows:
-                normalized = os.path.basename((media_path or "").replace("\\", "/")).strip()
-                if not normalized:
-                    normalized = f"media-{media_id}"
-                conn.execute(
-                    text("UPDATE media SET name=:name WHERE id=:id"),
-                    {"name": normalized, "id": media_id},
-                )
+    screen_cols = conn.execute(text("PRAGMA table_info(screen)")).fetchall()
+    screen_col_names = {row[1] for row in screen_cols}
+    if "active_playlist_id" not in screen_col_names:
+        conn.execute(text("ALTER TABLE screen ADD COLUMN active_playlist_id VARCHAR"))
+    if "grid_preset" not in screen_col_names:
+        conn.execute(text("ALTER TABLE screen ADD COLUMN grid_preset VARCHAR DEFAULT '1x1'"))
+    if "transition_duration_sec" not in screen_col_names:
+        conn.execute(text("ALTER TABLE screen ADD COLUMN transition_duration_sec INTEGER DEFAULT 1"))
+    conn.execute(
+        text(
+            "UPDATE screen SET grid_preset='1x1' "
+            "WHERE grid_preset IS NULL OR trim(grid_preset)=''"
+        )
+    )
+    conn.execute(
+        text(
+            "UPDATE screen SET transition_duration_sec=1 "
+            "WHERE transition_duration_sec IS NULL"
+        )
+    )
+    conn.execute(
+        text(
+            "UPDATE screen SET transition_duration_sec=0 "
+            "WHERE transition_duration_sec < 0"
+        )
+    )
+    conn.execute(
+        text(
+            "UPDATE screen SET transition_duration_sec=30 "
+            "WHERE transition_duration_sec > 30"
+        )
+    )
 
-        screen_cols = conn.execute(text("PRAGMA table_info(screen)")).fetchall()
-        screen_col_names = {row[1] for row in screen_cols}
-        if "active_playlist_id" not in screen_col_names:
-            conn.execute(text("ALTER TABLE screen ADD COLUMN active_playlist_id VARCHAR"))
-        if "grid_preset" not in screen_col_names:
-            conn.execute(text("ALTER TABLE screen ADD COLUMN grid_preset VARCHAR DEFAULT '1x1'"))
-        if "transition_duration_sec" not in screen_col_names:
-            conn.execute(text("ALTER TABLE screen ADD COLUMN transition_duration_sec INTEGER DEFAULT 1"))
+    schedule_cols = conn.execute(text("PRAGMA table_info(schedule)")).fetchall()
+    schedule_col_names = {row[1] for row in schedule_cols}
+    if "note" not in schedule_col_names:
+        conn.execute(text("ALTER TABLE schedule ADD COLUMN note VARCHAR"))
+    if "countdown_sec" not in schedule_col_names:
+        conn.execute(text("ALTER TABLE schedule ADD COLUMN countdown_sec INTEGER"))
+    conn.execute(
+        text(
+            "UPDATE schedule SET countdown_sec=NULL "
+            "WHERE countdown_sec IS NOT NULL AND countdown_sec <= 0"
+        )
+    )
+
+    playlist_cols = conn.execute(text("PRAGMA table_info(playlist)")).fetchall()
+    playlist_col_names = {row[1] for row in playlist_cols}
+    if "is_flash_sale" not in playlist_col_names:
         conn.execute(
-            text(
-                "UPDATE screen SET grid_preset='1x1' "
-                "WHERE grid_preset IS NULL OR trim(grid_preset)=''"
-            )
+            text("ALTER TABLE playlist ADD COLUMN is_flash_sale INTEGER DEFAULT 0")
         )
+    if "flash_note" not in playlist_col_names:
+        conn.execute(text("ALTER TABLE playlist ADD COLUMN flash_note VARCHAR"))
+    if "flash_countdown_sec" not in playlist_col_names:
+        conn.execute(
+            text("ALTER TABLE playlist ADD COLUMN flash_countdown_sec INTEGER")
+        )
+    if "flash_items_json" not in playlist_col_names:
+        conn.execute(text("ALTER TABLE playlist ADD COLUMN flash_items_json VARCHAR"))
+    conn.execute(
+        text(
+            "UPDATE playlist SET is_flash_sale=0 "
+            "WHERE is_flash_sale IS NULL"
+        )
+    )
+    conn.execute(
+        text(
+            "UPDATE playlist SET flash_countdown_sec=NULL "
+            "WHERE flash_countdown_sec IS NOT NULL AND flash_countdown_sec <= 0"
+        )
+    )
+
+    flash_sale_exists = conn.execute(
+        text("SELECT name FROM sqlite_master WHERE type='table' AND name='flash_sale_config'")
+    ).fetchone()
+    if flash_sale_exists:
+        flash_sale_cols = conn.execute(text("PRAGMA table_info(flash_sale_config)")).fetchall()
+        flash_sale_col_names = {row[1] for row in flash_sale_cols}
+        if "is_draft" not in flash_sale_col_names:
+            conn.execute(text("ALTER TABLE flash_sale_config ADD COLUMN is_draft INTEGER DEFAULT 0"))
+        if "warmup_minutes" not in flash_sale_col_names:
+            conn.execute(text("ALTER TABLE flash_sale_config ADD COLUMN warmup_minutes INTEGER"))
+        if "schedule_start_date" not in flash_sale_col_names:
+            conn.execute(text("ALTER TABLE flash_sale_config ADD COLUMN schedule_start_date VARCHAR"))
+        if "schedule_end_date" not in flash_sale_col_names:
+            conn.execute(text("ALTER TABLE flash_sale_config ADD COLUMN schedule_end_date VARCHAR"))
         conn.execute(
             text(
-                "UPDATE screen SET transition_duration_sec=1 "
-                "WHERE transition_duration_sec IS NULL"
+                "UPDATE flash_sale_config SET is_draft=0 "
+                "WHERE is_draft IS NULL"
             )
         )
         conn.execute(
             text(
-                "UPDATE screen SET transition_duration_sec=0 "
-                "WHERE transition_duration_sec < 0"
+                "UPDATE flash_sale_config SET warmup_minutes=NULL "
+                "WHERE warmup_minutes IS NOT NULL AND warmup_minutes <= 0"
             )
         )
         conn.execute(
             text(
-                "UPDATE screen SET transition_duration_sec=30 "
-                "WHERE transition_duration_sec > 30"
+                "UPDATE flash_sale_config SET schedule_start_date=NULL "
+                "WHERE schedule_start_date IS NOT NULL AND trim(schedule_start_date)=''"
             )
         )
-
-        schedule_cols = conn.execute(text("PRAGMA table_info(schedule)")).fetchall()
-        schedule_col_names = {row[1] for row in schedule_cols}
-        if "note" not in schedule_col_names:
-            conn.execute(text("ALTER TABLE schedule ADD COLUMN note VARCHAR"))
-        if "countdown_sec" not in schedule_col_names:
-            conn.execute(text("ALTER TABLE schedule ADD COLUMN countdown_sec INTEGER"))
         conn.execute(
             text(
-                "UPDATE schedule SET countdown_sec=NULL "
-                "WHERE countdown_sec IS NOT NULL AND countdown_sec <= 0"
+                "UPDATE flash_sale_config SET schedule_end_date=NULL "
+                "WHERE schedule_end_date IS NOT NULL AND trim(schedule_end_date)=''"
             )
         )
 
-        playlist_cols = conn.execute(text("PRAGMA table_info(playlist)")).fetchall()
-        playlist_col_names = {row[1] for row in playlist_cols}
-        if "is_flash_sale" not in playlist_col_names:
-            conn.execute(
-                text("ALTER TABLE playlist ADD COLUMN is_flash_sale INTEGER DEFAULT 0")
-            )
-        if "flash_note" not in playlist_col_names:
-            conn.execute(text("ALTER TABLE playlist ADD COLUMN flash_note VARCHAR"))
-        if "flash_countdown_sec" not in playlist_col_names:
-            conn.execute(
-                text("ALTER TABLE playlist ADD COLUMN flash_countdown_sec INTEGER")
-            )
-        if "flash_items_json" not in playlist_col_names:
-            conn.execute(text("ALTER TABLE playlist ADD COLUMN flash_items_json VARCHAR"))
+    sync_state_exists = conn.execute(
+        text("SELECT name FROM sqlite_master WHERE type='table' AND name='device_sync_state'")
+    ).fetchone()
+    if sync_state_exists:
+        sync_state_cols = conn.execute(text("PRAGMA table_info(device_sync_state)")).fetchall()
+        sync_state_col_names = {row[1] for row in sync_state_cols}
+        if "ack_source" not in sync_state_col_names:
+            conn.execute(text("ALTER TABLE device_sync_state ADD COLUMN ack_source VARCHAR"))
+        if "ack_reason" not in sync_state_col_names:
+            conn.execute(text("ALTER TABLE device_sync_state ADD COLUMN ack_reason TEXT"))
+        if "ack_at" not in sync_state_col_names:
+            conn.execute(text("ALTER TABLE device_sync_state ADD COLUMN ack_at DATETIME"))
+
+    sync_item_exists = conn.execute(
+        text("SELECT name FROM sqlite_master WHERE type='table' AND name='device_sync_item'")
+    ).fetchone()
+    if sync_item_exists:
         conn.execute(
             text(
-                "UPDATE playlist SET is_flash_sale=0 "
-                "WHERE is_flash_sale IS NULL"
+                "CREATE INDEX IF NOT EXISTS ix_device_sync_item_device_rev_media "
+                "ON device_sync_item(device_id, plan_revision, media_id)"
             )
         )
         conn.execute(
             text(
-                "UPDATE playlist SET flash_countdown_sec=NULL "
-                "WHERE flash_countdown_sec IS NOT NULL AND flash_countdown_sec <= 0"
+                "CREATE INDEX IF NOT EXISTS ix_device_sync_item_device_rev_status "
+                "ON device_sync_item(device_id, plan_revision, status)"
             )
         )
 
-        flash_sale_exists = conn.execute(
-            text("SELECT name FROM sqlite_master WHERE type='table' AND name='flash_sale_config'")
-        ).fetchone()
-        if flash_sale_exists:
-            flash_sale_cols = conn.execute(text("PRAGMA table_info(flash_sale_config)")).fetchall()
-            flash_sale_col_names = {row[1] for row in flash_sale_cols}
-            if "is_draft" not in flash_sale_col_names:
-                conn.execute(text("ALTER TABLE flash_sale_config ADD COLUMN is_draft INTEGER DEFAULT 0"))
-            if "warmup_minutes" not in flash_sale_col_names:
-                conn.execute(text("ALTER TABLE flash_sale_config ADD COLUMN warmup_minutes INTEGER"))
-            if "schedule_start_date" not in flash_sale_col_names:
-                conn.execute(text("ALTER TABLE flash_sale_config ADD COLUMN schedule_start_date VARCHAR"))
-            if "schedule_end_date" not in flash_sale_col_names:
-                conn.execute(text("ALTER TABLE flash_sale_config ADD COLUMN schedule_end_date VARCHAR"))
-            conn.execute(
-                text(
-                    "UPDATE flash_sale_config SET is_draft=0 "
-                    "WHERE is_draft IS NULL"
-                )
-            )
-            conn.execute(
+    cached_media_exists = conn.execute(
+        text("SELECT name FROM sqlite_master WHERE type='table' AND name='device_cached_media'")
+    ).fetchone()
+    if cached_media_exists:
+        has_cached_rows = conn.execute(text("SELECT 1 FROM device_cached_media LIMIT 1")).fetchone()
+        if not has_cached_rows:
+            # One-time backfill from the CSV columns written before the table existed.
+            backfill_rows = []
+            device_rows = conn.execute(
                 text(
-                    "UPDATE flash_sale_config SET warmup_minutes=NULL "
-                    "WHERE warmup_minutes IS NOT NULL AND warmup_minutes <= 0"
+                    "SELECT id, cached_media_low_ids, cached_media_ids, cached_media_high_ids "
+                    "FROM device WHERE media_cache_updated_at IS NOT NULL"
                 )
-            )
-            conn.execute(
-                text(
-                    "UPDATE flash_sale_config SET schedule_start_date=NULL "
-                    "WHERE schedule_start_date IS NOT NULL AND trim(schedule_start_date)=''"
-                )
-            )
-            conn.execute(
-                text(
-                    "UPDATE flash_sale_config SET schedule_end_date=NULL "
-                    "WHERE schedule_end_date IS NOT NULL AND trim(schedule_end_date)=''"
+            ).fetchall()
+            for device_id, low_csv, normal_csv, high_csv in device_rows:
+                for tier, csv in (("low", low_csv), ("normal", normal_csv), ("high", high_csv)):
+                    for media_id in {item.strip() for item in (csv or "").split(",") if item.strip()}:
+                        backfill_rows.append({"device_id": device_id, "tier": tier, "media_id": media_id})
+            if backfill_rows:
+                conn.execute(
+                    text(
+                        "INSERT OR IGNORE INTO device_cached_media (device_id, tier, media_id) "
+                        "VALUES (:device_id, :tier, :media_id)"
+                    ),
+                    backfill_rows,
                 )
-            )
 
-        sync_state_exists = conn.execute(
-            text("SELECT name FROM sqlite_master WHERE type='table' AND name='device_sync_state'")
+    # Covering indexes for the screen -> schedule/playlist -> item lookups done on every config/status poll,
+    # plus the (created_at, id) order used by media paging.
+    for table_name, index_sql in (
+        ("screen", "CREATE INDEX IF NOT EXISTS ix_screen_device ON screen(device_id)"),
+        (
+            "schedule",
+            "CREATE INDEX IF NOT EXISTS ix_schedule_screen_playlist ON schedule(screen_id, playlist_id)",
+        ),
+        ("schedule", "CREATE INDEX IF NOT EXISTS ix_schedule_playlist ON schedule(playlist_id)"),
+        (
+            "schedule",
+            "CREATE INDEX IF NOT EXISTS ix_schedule_screen_day_time "
+            "ON schedule(screen_id, day_of_week, start_time, end_time)",
+        ),
+        ("playlist", "CREATE INDEX IF NOT EXISTS ix_playlist_screen ON playlist(screen_id)"),
+        ("media", "CREATE INDEX IF NOT EXISTS ix_media_created_id ON media(created_at, id)"),
+        (
+            "playlist_item",
+            "CREATE INDEX IF NOT EXISTS ix_playlist_item_playlist_media ON playlist_item(playlist_id, media_id)",
+        ),
+        (
+            "playlist_item",
+            'CREATE INDEX IF NOT EXISTS ix_playlist_item_playlist_order ON playlist_item(playlist_id, "order")',
+        ),
+    ):
+        table_exists = conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type='table' AND name=:name"),
+            {"name": table_name},
         ).fetchone()
-        if sync_state_exists:
-            sync_state_cols = conn.execute(text("PRAGMA table_info(device_sync_state)")).fetchall()
-            sync_state_col_names = {row[1] for row in sync_state_cols}
-            if "ack_source" not in sync_state_col_names:
-                conn.execute(text("ALTER TABLE device_sync_state ADD COLUMN ack_source VARCHAR"))
-            if "ack_reason" not in sync_state_col_names:
-                conn.execute(text("ALTER TABLE device_sync_state ADD COLUMN ack_reason TEXT"))
-            if "ack_at" not in sync_state_col_names:
-                conn.execute(text("ALTER TABLE device_sync_state ADD COLUMN ack_at DATETIME"))
+        if table_exists:
+            conn.execute(text(index_sql))
+
+
+# Tables `_patch_sqlite_schema` reads or rewrites; append-only tables such as
+# device_sync_item stay out of the fingerprint.
+_PATCHED_TABLES = ("device", "media", "screen", "schedule", "playlist", "flash_sale_config")
+try:
+    _PATCH_SOURCE_DIGEST: str | None = hashlib.sha1(inspect.getsource(_patch_sqlite_schema).encode("utf-8")).hexdigest()
+except (OSError, TypeError):  # pragma: no cover - source unavailable (e.g. frozen build): always patch
+    _PATCH_SOURCE_DIGEST = None
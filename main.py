@@ -5,17 +5,20 @@ import logging
 import subprocess
 import re
 import time
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
+import anyio.to_thread
+from sqlalchemy import case, or_
 from app.db import Base, engine, ensure_sqlite_schema
-from app.db import SessionLocal
+from app.db import MAX_OVERFLOW, POOL_SIZE, SessionLocal
 from app.api import media, device, playlist, schedule, screen, flash_sale
 from app.models.device import Device
 from app.services.storage import ensure_storage
 from app.services.realtime import hub
+from app.services.serialization import FastJSONResponse
 
 Base.metadata.create_all(bind=engine)
 ensure_sqlite_schema()
@@ -28,9 +31,13 @@ DEVICE_STATUS_SWEEP_SEC = int(os.getenv("SIGNAGE_DEVICE_STATUS_SWEEP_SEC", "5"))
 QUIET_ACCESS_LOG = os.getenv("SIGNAGE_QUIET_ACCESS_LOG", "1").strip().lower() in {"1", "true", "yes", "on"}
 QUIET_WEBSOCKET_LOG = os.getenv("SIGNAGE_QUIET_WEBSOCKET_LOG", "1").strip().lower() in {"1", "true", "yes", "on"}
 _device_status_task: asyncio.Task | None = None
+_heartbeat_flush_task: asyncio.Task | None = None
 _primary_ip_cache: str | None = None
 _primary_ip_cache_at: float = 0.0
 PRIMARY_IP_CACHE_TTL_SEC = int(os.getenv("SIGNAGE_PRIMARY_IP_CACHE_TTL_SEC", "15"))
+# Sync endpoints run on anyio's worker threads (default 40). Size it to the DB pool so
+# requests queue for a thread rather than for a connection inside a thread.
+THREADPOOL_SIZE = int(os.getenv("SIGNAGE_THREADPOOL_SIZE", str(POOL_SIZE + MAX_OVERFLOW)))
 
 if QUIET_ACCESS_LOG:
     # Keep warning/error lines, suppress normal access noise (200/201 etc).
@@ -140,32 +147,53 @@ def _derive_device_status(last_seen: datetime | None, now_utc: datetime) -> str:
     return "online" if age <= DEVICE_OFFLINE_AFTER_SEC else "offline"
 
 
+def _sweep_device_status() -> list[dict[str, str | None]]:
+    changed_payload: list[dict[str, str | None]] = []
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        # Heartbeats waiting for the next flush are newer than the stored last_seen.
+        buffered = device.buffered_heartbeats()
+        cutoff = now - timedelta(seconds=DEVICE_OFFLINE_AFTER_SEC)
+        fresh_ids = [device_id for device_id, seen in buffered.items() if seen >= cutoff]
+        seen_recently = Device.last_seen >= cutoff
+        if fresh_ids:
+            seen_recently = or_(seen_recently, Device.id.in_(fresh_ids))
+        derived_status = case((seen_recently, "online"), else_="offline")
+        # Only rows whose stored status disagrees with the derived one leave the database.
+        devices = (
+            db.query(Device)
+            .filter(or_(Device.status.is_(None), Device.status != derived_status))
+            .all()
+        )
+        for item in devices:
+            last_seen = device.effective_last_seen(str(item.id), item.last_seen, buffered)
+            next_status = _derive_device_status(last_seen, now)
+            if item.status != next_status:
+                item.status = next_status
+                changed_payload.append(
+                    {
+                        "device_id": str(item.id),
+                        "status": next_status,
+                        "last_seen": last_seen.isoformat() if last_seen else None,
+                    }
+                )
+        if changed_payload:
+            db.commit()
+    except Exception:
+        db.rollback()
+        changed_payload = []
+    finally:
+        db.close()
+    return changed_payload
+
+
 async def _device_status_watcher() -> None:
     while True:
         await asyncio.sleep(DEVICE_STATUS_SWEEP_SEC)
-        changed_payload: list[dict[str, str | None]] = []
-        db = SessionLocal()
-        try:
-            now = datetime.utcnow()
-            devices = db.query(Device).all()
-            for item in devices:
-                next_status = _derive_device_status(item.last_seen, now)
-                if item.status != next_status:
-                    item.status = next_status
-                    changed_payload.append(
-                        {
-                            "device_id": str(item.id),
-                            "status": next_status,
-                            "last_seen": item.last_seen.isoformat() if item.last_seen else None,
-                        }
-                    )
-            if changed_payload:
-                db.commit()
-        except Exception:
-            db.rollback()
-        finally:
-            db.close()
-
+        # The sweep is blocking SQLAlchemy work; run it off the event loop so websocket
+        # traffic and async middleware are not stalled while it waits on SQLite.
+        changed_payload = await asyncio.to_thread(_sweep_device_status)
         if changed_payload:
             await hub.publish(
                 "device_status_changed",
@@ -175,7 +203,15 @@ async def _device_status_watcher() -> None:
                 },
             )
 
-app = FastAPI()
+async def _heartbeat_flusher() -> None:
+    while True:
+        await asyncio.sleep(device.HEARTBEAT_FLUSH_INTERVAL_SEC)
+        try:
+            await asyncio.to_thread(device.flush_heartbeat_buffer)
+        except Exception:
+            logging.getLogger(__name__).exception("Heartbeat flush failed")
+
+app = FastAPI(default_response_class=FastJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -226,14 +262,18 @@ async def ws_updates(websocket: WebSocket):
 
 @app.on_event("startup")
 async def startup_events() -> None:
-    global _device_status_task
+    global _device_status_task, _heartbeat_flush_task
+    if THREADPOOL_SIZE > 0:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
     if _device_status_task is None or _device_status_task.done():
         _device_status_task = asyncio.create_task(_device_status_watcher())
+    if device.HEARTBEAT_FLUSH_INTERVAL_SEC > 0 and (_heartbeat_flush_task is None or _heartbeat_flush_task.done()):
+        _heartbeat_flush_task = asyncio.create_task(_heartbeat_flusher())
 
 
 @app.on_event("shutdown")
 async def shutdown_events() -> None:
-    global _device_status_task
+    global _device_status_task, _heartbeat_flush_task
     if _device_status_task is not None:
         _device_status_task.cancel()
         try:
@@ -241,6 +281,17 @@ async def shutdown_events() -> None:
         except asyncio.CancelledError:
             pass
         _device_status_task = None
+    if _heartbeat_flush_task is not None:
+        _heartbeat_flush_task.cancel()
+        try:
+            await _heartbeat_flush_task
+        except asyncio.CancelledError:
+            pass
+        _heartbeat_flush_task = None
+    try:
+        device.flush_heartbeat_buffer()
+    except Exception:
+        logging.getLogger(__name__).exception("Heartbeat flush failed")
 
 @app.middleware("http")
 async def api_key_middleware(request: Request, call_next):
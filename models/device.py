@@ -1,16 +1,24 @@
 import uuid
 from datetime import datetime
+from functools import lru_cache
 from sqlalchemy import Column, String, DateTime, Text
 from app.db import Base
 
+
+@lru_cache(maxsize=1024)
+def _parse_media_id_csv(csv: str) -> frozenset[str]:
+    # Keyed on the raw column value, so a device is re-parsed only after a new cache report.
+    return frozenset(value for value in (item.strip() for item in csv.split(",")) if value)
+
+
 class Device(Base):
     __tablename__ = "device"
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    legacy_id = Column(String(36), nullable=True)
+    legacy_id = Column(String(36), nullable=True, index=True)
     client_ip = Column(String, nullable=True, unique=True)
     name = Column(String, nullable=False)
     location = Column(String)
-    owner_account = Column(String, nullable=True)
+    owner_account = Column(String, nullable=True, index=True)
     last_seen = Column(DateTime)
     status = Column(String, default="offline")
     orientation = Column(String, default="portrait")
@@ -19,3 +27,15 @@ class Device(Base):
     cached_media_ids = Column(Text, nullable=True)
     cached_media_high_ids = Column(Text, nullable=True)
     media_cache_updated_at = Column(DateTime, nullable=True)
+
+    @property
+    def cached_media_id_set(self) -> frozenset[str]:
+        return _parse_media_id_csv(self.cached_media_ids or "")
+
+    @property
+    def cached_media_low_id_set(self) -> frozenset[str]:
+        return _parse_media_id_csv(self.cached_media_low_ids or "")
+
+    @property
+    def cached_media_high_id_set(self) -> frozenset[str]:
+        return _parse_media_id_csv(self.cached_media_high_ids or "")
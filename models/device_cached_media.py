@@ -0,0 +1,17 @@
+from sqlalchemy import Column, ForeignKey, String
+
+from app.db import Base
+
+
+class DeviceCachedMedia(Base):
+    """One row per media id a device reported in its cache, per quality tier.
+
+    Mirrors the `cached_media_*_ids` CSV columns on `Device` so membership checks
+    against a handful of ids can run in SQL instead of parsing the whole list.
+    """
+
+    __tablename__ = "device_cached_media"
+
+    device_id = Column(String(36), ForeignKey("device.id", ondelete="CASCADE"), primary_key=True)
+    tier = Column(String(8), primary_key=True)
+    media_id = Column(String(36), primary_key=True)
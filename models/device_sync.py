@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Index, Integer, String, Text
 
 from app.db import Base
 
@@ -10,7 +10,7 @@ class DeviceSyncState(Base):
     __tablename__ = "device_sync_state"
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    device_id = Column(String(36), ForeignKey("device.id"), nullable=False, unique=True)
+    device_id = Column(String(36), ForeignKey("device.id", ondelete="CASCADE"), nullable=False, unique=True)
     plan_revision = Column(String(64), nullable=True)
     queue_status = Column(String(32), nullable=False, default="idle")
     downloaded_bytes = Column(BigInteger, nullable=False, default=0)
@@ -29,9 +29,13 @@ class DeviceSyncState(Base):
 
 class DeviceSyncItem(Base):
     __tablename__ = "device_sync_item"
+    __table_args__ = (
+        Index("ix_device_sync_item_device_rev_media", "device_id", "plan_revision", "media_id"),
+        Index("ix_device_sync_item_device_rev_status", "device_id", "plan_revision", "status"),
+    )
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    device_id = Column(String(36), ForeignKey("device.id"), nullable=False)
+    device_id = Column(String(36), ForeignKey("device.id", ondelete="CASCADE"), nullable=False)
     plan_revision = Column(String(64), nullable=False)
     media_id = Column(String(36), ForeignKey("media.id"), nullable=False)
     priority = Column(String(16), nullable=False, default="P3")
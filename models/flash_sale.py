@@ -10,7 +10,7 @@ class FlashSaleConfig(Base):
     __tablename__ = "flash_sale_config"
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    device_id = Column(String(36), ForeignKey("device.id"), nullable=False, unique=True)
+    device_id = Column(String(36), ForeignKey("device.id", ondelete="CASCADE"), nullable=False, unique=True)
     enabled = Column(Boolean, nullable=False, default=True)
     is_draft = Column(Boolean, nullable=False, default=False)
     note = Column(String, nullable=True)
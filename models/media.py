@@ -1,10 +1,12 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, BigInteger, DateTime
+from sqlalchemy import Column, Index, String, Integer, BigInteger, DateTime
 from app.db import Base
 
 class Media(Base):
     __tablename__ = "media"
+    __table_args__ = (Index("ix_media_created_id", "created_at", "id"),)
+
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String, nullable=False)
     type = Column(String, nullable=False)
@@ -1,21 +1,31 @@
 import uuid
-from sqlalchemy import Column, String, Integer, Boolean, ForeignKey
+from sqlalchemy import Column, Index, String, Integer, Boolean, ForeignKey
+from sqlalchemy.orm import relationship
 from app.db import Base
 
 class Playlist(Base):
     __tablename__ = "playlist"
+    __table_args__ = (Index("ix_playlist_screen", "screen_id"),)
+
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    screen_id = Column(String(36), ForeignKey("screen.id"), nullable=False)
+    screen_id = Column(String(36), ForeignKey("screen.id", ondelete="CASCADE"), nullable=False)
     name = Column(String, nullable=False)
     is_flash_sale = Column(Boolean, nullable=False, default=False)
     flash_note = Column(String, nullable=True)
     flash_countdown_sec = Column(Integer, nullable=True)
     flash_items_json = Column(String, nullable=True)
+    # Explicit order: with the composite indexes the planner no longer guarantees insertion order.
+    items = relationship("PlaylistItem", viewonly=True, order_by="(PlaylistItem.order, PlaylistItem.id)")
 
 class PlaylistItem(Base):
     __tablename__ = "playlist_item"
+    __table_args__ = (
+        Index("ix_playlist_item_playlist_media", "playlist_id", "media_id"),
+        Index("ix_playlist_item_playlist_order", "playlist_id", "order"),
+    )
+
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    playlist_id = Column(String(36), ForeignKey("playlist.id"), nullable=False)
+    playlist_id = Column(String(36), ForeignKey("playlist.id", ondelete="CASCADE"), nullable=False)
     media_id = Column(String(36), ForeignKey("media.id"), nullable=False)
     order = Column(Integer, nullable=False)
     duration_sec = Column(Integer)
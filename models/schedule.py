@@ -1,12 +1,18 @@
 import uuid
-from sqlalchemy import Column, Integer, Time, ForeignKey, String
+from sqlalchemy import Column, Index, Integer, Time, ForeignKey, String
 from app.db import Base
 
 class Schedule(Base):
     __tablename__ = "schedule"
+    __table_args__ = (
+        Index("ix_schedule_screen_playlist", "screen_id", "playlist_id"),
+        Index("ix_schedule_playlist", "playlist_id"),
+        Index("ix_schedule_screen_day_time", "screen_id", "day_of_week", "start_time", "end_time"),
+    )
+
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    screen_id = Column(String(36), ForeignKey("screen.id"), nullable=False)
-    playlist_id = Column(String(36), ForeignKey("playlist.id"), nullable=False)
+    screen_id = Column(String(36), ForeignKey("screen.id", ondelete="CASCADE"), nullable=False)
+    playlist_id = Column(String(36), ForeignKey("playlist.id", ondelete="CASCADE"), nullable=False)
     day_of_week = Column(Integer, nullable=False)
     start_time = Column(Time, nullable=False)
     end_time = Column(Time, nullable=False)
@@ -1,13 +1,24 @@
 import uuid
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Index, Integer, String, ForeignKey
+from sqlalchemy.orm import relationship
 from app.db import Base
 
 
 class Screen(Base):
     __tablename__ = "screen"
+    __table_args__ = (Index("ix_screen_device", "device_id"),)
+
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    device_id = Column(String(36), ForeignKey("device.id"), nullable=False)
+    device_id = Column(String(36), ForeignKey("device.id", ondelete="CASCADE"), nullable=False)
     name = Column(String, nullable=False)
     active_playlist_id = Column(String(36), nullable=True)
     grid_preset = Column(String(16), default="1x1")
     transition_duration_sec = Column(Integer, default=1)
+
+    # Read-only collections for eager loading (selectinload); writes still go through the FK columns.
+    playlists = relationship("Playlist", viewonly=True)
+    schedules = relationship(
+        "Schedule",
+        viewonly=True,
+        order_by="(Schedule.day_of_week, Schedule.start_time, Schedule.id)",
+    )
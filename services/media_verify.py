@@ -0,0 +1,25 @@
+import os
+
+from sqlalchemy import event
+
+from app.models.media import Media
+from app.services.cache import TTLCache
+
+MEDIA_VERIFY_CACHE_TTL_SEC = float(os.getenv("SIGNAGE_MEDIA_VERIFY_CACHE_TTL_SEC", "30"))
+# Media-id sets already confirmed to exist, shared by the playlist and flash-sale validators.
+# Only positive verdicts are stored and any Media delete in this process clears it; the TTL
+# bounds staleness from deletes made elsewhere.
+_verified_media_ids_cache = TTLCache(MEDIA_VERIFY_CACHE_TTL_SEC, 1024)
+
+
+def media_ids_verified(media_ids: frozenset[str]) -> bool:
+    return bool(_verified_media_ids_cache.get(media_ids))
+
+
+def mark_media_ids_verified(media_ids: frozenset[str]) -> None:
+    _verified_media_ids_cache.set(media_ids, True)
+
+
+@event.listens_for(Media, "after_delete")
+def _forget_verified_media(mapper, connection, target) -> None:
+    _verified_media_ids_cache.invalidate()
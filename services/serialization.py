@@ -0,0 +1,46 @@
+import json
+from datetime import date, datetime, time
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except Exception:  # pragma: no cover - optional dependency fallback
+    orjson = None
+
+
+def json_loads(raw: str | bytes) -> Any:
+    if orjson is None:
+        return json.loads(raw)
+    return orjson.loads(raw)
+
+
+def json_dumps(value: Any) -> str:
+    """Compact JSON text; non-ASCII is kept as UTF-8 rather than \\u-escaped."""
+    if orjson is None:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return orjson.dumps(value).decode("utf-8")
+
+
+def _json_default(value: Any) -> str:
+    # Matches orjson's native output for the temporal types handlers pass through unformatted.
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed, stdlib json otherwise."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return json.dumps(
+                content,
+                ensure_ascii=False,
+                allow_nan=False,
+                indent=None,
+                separators=(",", ":"),
+                default=_json_default,
+            ).encode("utf-8")
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
@@ -19,6 +19,7 @@ VIDEO_TARGET_BITRATE = os.getenv("SIGNAGE_VIDEO_TARGET_BITRATE", "4M")
 VIDEO_AUDIO_BITRATE = os.getenv("SIGNAGE_VIDEO_AUDIO_BITRATE", "128k")
 ALLOWED_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
 ALLOWED_VIDEO_EXTENSIONS = {".mp4", ".webm", ".mkv", ".mov"}
+UPLOAD_CHUNK_BYTES = 1024 * 1024
 
 def ensure_storage() -> None:
     os.makedirs(MEDIA_DIR, exist_ok=True)
@@ -47,7 +48,7 @@ def _sha256_file(path: str) -> str:
     return h.hexdigest()
 
 
-def _optimize_image_file(path: str, filename: str, size: int) -> tuple[str, int, str]:
+def _optimize_image_file(path: str, filename: str, size: int, checksum: str) -> tuple[str, int, str]:
     _, ext = os.path.splitext(filename.lower())
     try:
         img = Image.open(path)
@@ -56,7 +57,7 @@ def _optimize_image_file(path: str, filename: str, size: int) -> tuple[str, int,
         needs_resize = width > IMAGE_MAX_WIDTH or height > IMAGE_MAX_HEIGHT
         needs_reencode = ext not in {".jpg", ".jpeg"} or size > RECOMMENDED_IMAGE_BYTES
         if not needs_resize and not needs_reencode:
-            return path, size, _sha256_file(path)
+            return path, size, checksum
 
         if img.mode not in ("RGB", "L"):
             img = img.convert("RGB")
@@ -86,16 +87,16 @@ def _optimize_image_file(path: str, filename: str, size: int) -> tuple[str, int,
         new_size = os.path.getsize(new_path)
         return new_path, new_size, _sha256_file(new_path)
     except Exception:
-        return path, size, _sha256_file(path)
+        return path, size, checksum
 
 
-def _optimize_video_file(path: str, filename: str, size: int) -> tuple[str, int, str]:
+def _optimize_video_file(path: str, filename: str, size: int, checksum: str) -> tuple[str, int, str]:
     if size <= RECOMMENDED_VIDEO_BYTES:
-        return path, size, _sha256_file(path)
+        return path, size, checksum
 
     ffmpeg = shutil.which("ffmpeg")
     if ffmpeg is None:
-        return path, size, _sha256_file(path)
+        return path, size, checksum
 
     safe_base, _ = os.path.splitext(os.path.basename(filename))
     safe_base = safe_base.replace(" ", "-").strip("-") or "media"
@@ -137,40 +138,57 @@ def _optimize_video_file(path: str, filename: str, size: int) -> tuple[str, int,
             return new_path, new_size, _sha256_file(new_path)
     except Exception:
         pass
-    return path, size, _sha256_file(path)
+    return path, size, checksum
 
 
 def _maybe_optimize_media(
-    path: str, media_type: str, filename: str, size: int
+    path: str, media_type: str, filename: str, size: int, checksum: str
 ) -> tuple[str, int, str]:
+    """`checksum` is the digest of the file at `path`; it is reused when the file is kept as-is."""
     if media_type == "image":
-        return _optimize_image_file(path, filename, size)
+        return _optimize_image_file(path, filename, size, checksum)
     if media_type == "video":
-        return _optimize_video_file(path, filename, size)
-    return path, size, _sha256_file(path)
+        return _optimize_video_file(path, filename, size, checksum)
+    return path, size, checksum
 
 
 def save_file(file: UploadFile, declared_type: str) -> tuple[str, int, str]:
     ensure_storage()
     media_type = _normalized_media_type(declared_type)
-    content = file.file.read()
-    if not content:
+    first_chunk = file.file.read(UPLOAD_CHUNK_BYTES)
+    if not first_chunk:
         raise ValueError("File kosong tidak bisa diupload.")
-    checksum = hashlib.sha256(content).hexdigest()
     filename = os.path.basename((file.filename or "upload.bin").strip()) or "upload.bin"
     ext = _validate_extension(media_type, filename)
-    size = len(content)
-    if media_type == "image" and size > MAX_IMAGE_BYTES:
-        raise ValueError(f"Ukuran gambar melebihi batas {MAX_IMAGE_BYTES // (1024 * 1024)} MB.")
-    if media_type == "video" and size > MAX_VIDEO_BYTES:
-        raise ValueError(f"Ukuran video melebihi batas {MAX_VIDEO_BYTES // (1024 * 1024)} MB.")
+    max_bytes = MAX_IMAGE_BYTES if media_type == "image" else MAX_VIDEO_BYTES
     safe_name, _ = os.path.splitext(filename)
     safe_name = "".join(ch for ch in safe_name if ch.isalnum() or ch in {"-", "_", " "}).strip() or "media"
     stamped_filename = f"{safe_name}-{int(time.time() * 1000)}{ext}"
     path = os.path.join(MEDIA_DIR, stamped_filename)
+
+    # Stream to disk in chunks, hashing as we go, instead of holding the whole upload in memory
+    # and hashing it again from disk afterwards.
+    h = hashlib.sha256()
+    size = 0
     with open(path, "wb") as f:
-        f.write(content)
+        chunk = first_chunk
+        while chunk:
+            size += len(chunk)
+            if size > max_bytes:
+                break
+            h.update(chunk)
+            f.write(chunk)
+            chunk = file.file.read(UPLOAD_CHUNK_BYTES)
+    if size > max_bytes:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        if media_type == "image":
+            raise ValueError(f"Ukuran gambar melebihi batas {MAX_IMAGE_BYTES // (1024 * 1024)} MB.")
+        raise ValueError(f"Ukuran video melebihi batas {MAX_VIDEO_BYTES // (1024 * 1024)} MB.")
+
     final_path, final_size, final_checksum = _maybe_optimize_media(
-        path, media_type, filename, size
+        path, media_type, filename, size, h.hexdigest()
     )
     return final_path.replace("\\", "/"), final_size, final_checksum